@@ -1,6 +1,9 @@
 ﻿from pathlib import Path
 # -*- coding: utf-8 -*-
-import os, re, uuid, json
+import os, re, uuid, json, asyncio, multiprocessing, random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from urllib.parse import quote
@@ -29,6 +32,10 @@ try:
     import requests
 except Exception:
     requests = None
+try:
+    import orjson  # decodes provider JSON straight from the response bytes
+except Exception:
+    orjson = None
 
 # --- Internal modules ---
 # Robust utils import: package or local fallback
@@ -53,11 +60,12 @@ except Exception:
     _enforce_hashtag_rules = None
 try:
     try:
-        from utils.send_email import send_pdf_email
+        from utils.send_email import schedule_pdf_email, aclose as _close_email_client
     except ImportError:
-        from utils.send_email import send_pdf_email
+        from utils.send_email import schedule_pdf_email, aclose as _close_email_client
 except Exception:
-    send_pdf_email = None
+    schedule_pdf_email = None
+    _close_email_client = None
 
 # ---- FastAPI app ----
 app = FastAPI()
@@ -79,6 +87,8 @@ if stripe:
         pass
 
 OUTPUT_FOLDER   = os.getenv("OUTPUT_DIR", "generated")
+# PDF renderer processes per server worker (multiply by uvicorn --workers for the total)
+PDF_WORKERS     = max(1, int(os.getenv("PDF_WORKERS", "2") or 2))
 
 BRAND_NAME      = os.getenv("BRAND_NAME", "Content365")
 BRAND_WEBSITE   = (os.getenv("BRAND_WEBSITE") or os.getenv("APP_DOMAIN") or "content365.xyz").strip()
@@ -88,6 +98,9 @@ AI_PROVIDER     = (os.getenv("AI_PROVIDER", "openrouter") or "openrouter").strip
 PROVIDER_ORDER  = [p.strip().lower() for p in (os.getenv("PROVIDER_ORDER") or AI_PROVIDER).split(",") if p.strip()]
 LLM_API_URL     = os.getenv("LLM_API_URL", "").strip()
 LLM_MODEL       = os.getenv("LLM_MODEL", "").strip()
+# true -> ask the OpenAI-compatible endpoint for response_format=json_object (many local servers reject it)
+LLM_JSON_MODE   = (os.getenv("LLM_JSON_MODE", "false").strip().lower() == "true")
+LLM_MAX_INFLIGHT = max(1, int(os.getenv("LLM_MAX_INFLIGHT", "8") or 8))
 OPENROUTER_KEY  = os.getenv("OPENROUTER_API_KEY", "")
 HAS_OR_KEY      = bool(OPENROUTER_KEY)
 HAS_GEM_KEY     = bool(os.getenv("GOOGLE_API_KEY"))
@@ -104,7 +117,19 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 # ------------------------------------------------------------------------------
 # APP
 # ------------------------------------------------------------------------------
-app = FastAPI(title="Content365", version=APP_VERSION)
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    global _PDF_POOL
+    _PDF_POOL = _new_pdf_pool()
+    yield
+    _PDF_POOL.shutdown(wait=True, cancel_futures=True)
+    _PDF_POOL = None
+    if _LLM_CLIENT is not None:
+        await _LLM_CLIENT.aclose()
+    if _close_email_client:
+        await _close_email_client()
+
+app = FastAPI(title="Content365", version=APP_VERSION, lifespan=_lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[o.strip() for o in (os.getenv("CORS_ALLOW_ORIGINS") or "*").split(",") if o.strip()],
@@ -133,6 +158,7 @@ async def _debug_form_path():
 # HELPERS
 # ------------------------------------------------------------------------------
 _AI_WORD_RX = re.compile(r"\bai\b", flags=re.IGNORECASE)
+_LIST_SPLIT_RX = re.compile(r"[\s,]+")  # comma/space separated hashtags and platform lists
 
 def _fix_ai_casing(s: Optional[str]) -> str:
     if not s:
@@ -146,12 +172,21 @@ def _norm_platform(p: str) -> str:
         return "x"
     return p
 
+_ALLOWED_PLATFORMS = frozenset({"instagram", "tiktok", "linkedin", "x", "facebook"})
+# slug -> display key the AI output usually uses for captions/hashtags
+_PLATFORM_LABELS = {
+    "instagram": "Instagram",
+    "linkedin":  "LinkedIn",
+    "tiktok":    "TikTok",
+    "x":         "Twitter",
+    "facebook":  "Facebook",
+}
+
 def _valid_platforms(seq):
-    allowed = {"instagram", "tiktok", "linkedin", "x", "facebook"}
     out, seen = [], set()
     for s in (seq or []):
         ss = _norm_platform(s)
-        if ss in allowed and ss not in seen:
+        if ss in _ALLOWED_PLATFORMS and ss not in seen:
             seen.add(ss)
             out.append(ss)
     return out
@@ -189,7 +224,7 @@ def _coerce_hashtags(parsed: Dict[str, Any]) -> Dict[str, List[str]]:
             if isinstance(block, dict):
                 hs = block.get("hashtags", [])
                 if isinstance(hs, str):
-                    parts = [h.strip().lstrip("#") for h in re.split(r"[\s,]+", hs) if h.strip()]
+                    parts = [h.strip().lstrip("#") for h in _LIST_SPLIT_RX.split(hs) if h.strip()]
                     hs_list = parts
                 elif isinstance(hs, list):
                     hs_list = [str(h).strip().lstrip("#") for h in hs if str(h).strip()]
@@ -262,7 +297,7 @@ def _to_pdf_schema(parsed: Dict[str, Any]) -> Dict[str, Any]:
     if isinstance(hashtags, dict):
         for k, v in hashtags.items():
             if isinstance(v, str):
-                parts = [p.strip().lstrip("#") for p in re.split(r"[\s,]+", v) if p.strip()]
+                parts = [p.strip().lstrip("#") for p in _LIST_SPLIT_RX.split(v) if p.strip()]
                 tags_clean[k] = parts
             elif isinstance(v, list):
                 tags_clean[k] = [str(x).lstrip("#").strip() for x in v if str(x).strip()]
@@ -296,7 +331,7 @@ def _append_context_to_prompt(prompt: str, audience: str, notes: str) -> str:
 def _parse_platforms_param(raw_platforms: List[str]) -> List[str]:
     if not raw_platforms: return []
     if len(raw_platforms) == 1 and ("," in raw_platforms[0] or " " in raw_platforms[0]):
-        return [p.strip() for p in re.split(r"[,\s]+", raw_platforms[0]) if p.strip()]
+        return [p.strip() for p in _LIST_SPLIT_RX.split(raw_platforms[0]) if p.strip()]
     return raw_platforms
 
 def _apply_hashtag_rules(slug: str, tags: List[str], caption: str) -> List[str]:
@@ -316,6 +351,35 @@ def _apply_hashtag_rules(slug: str, tags: List[str], caption: str) -> List[str]:
 # ------------------------------------------------------------------------------
 # AI PROVIDERS
 # ------------------------------------------------------------------------------
+# One keep-alive client for the local/OpenAI-compatible endpoint (closed in _lifespan),
+# a cap on in-flight calls, and jittered backoff on rate limits / gateway errors.
+_LLM_CLIENT: Optional["httpx.AsyncClient"] = None
+_LLM_SEM = asyncio.Semaphore(LLM_MAX_INFLIGHT)
+_LLM_RETRY_STATUS = frozenset({429, 502, 503, 504})
+_LLM_RETRY_ATTEMPTS = 3
+
+def _llm_client() -> "httpx.AsyncClient":
+    global _LLM_CLIENT
+    if _LLM_CLIENT is None or _LLM_CLIENT.is_closed:
+        _LLM_CLIENT = httpx.AsyncClient(timeout=60)
+    return _LLM_CLIENT
+
+async def _post_llm(headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+    attempt = 0
+    while True:
+        final = attempt == _LLM_RETRY_ATTEMPTS - 1
+        try:
+            async with _LLM_SEM:
+                r = await _llm_client().post(LLM_API_URL, headers=headers, json=payload)
+            if final or r.status_code not in _LLM_RETRY_STATUS:
+                r.raise_for_status()
+                return orjson.loads(r.content) if orjson is not None else r.json()
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):  # never reached the server
+            if final:
+                raise
+        await asyncio.sleep(min(30.0, 2.0 ** attempt) * random.uniform(0.5, 1.0))
+        attempt += 1
+
 async def _call_local_llm(prompt: str) -> Optional[str]:
     if not (LLM_API_URL and LLM_MODEL):
         return None
@@ -327,13 +391,12 @@ async def _call_local_llm(prompt: str) -> Optional[str]:
         ],
         "temperature": 0.6, "top_p": 0.9, "max_tokens": 1200, "stream": False, "stop": ["```"],
     }
+    if LLM_JSON_MODE:
+        payload["response_format"] = {"type": "json_object"}
     headers = {"Content-Type": "application/json"}
     try:
         if httpx:
-            async with httpx.AsyncClient(timeout=60) as client:
-                r = await client.post(LLM_API_URL, headers=headers, json=payload)
-                r.raise_for_status()
-                data = r.json()
+            data = await _post_llm(headers, payload)
         elif requests:
             r = requests.post(LLM_API_URL, headers=headers, json=payload, timeout=60)
             r.raise_for_status()
@@ -394,17 +457,32 @@ async def form_get(request: Request):
     return templates.TemplateResponse("form.html", {"request": request, "version": APP_VERSION})
 
 # ---- Core helper: generate + save, return filename ----
-def _generate_and_save_pdf(pdf_payload: Dict[str, Any], brand: Dict[str, Any]) -> str:
+# ReportLab rendering is CPU-bound and holds the GIL; run it in worker processes
+# so a long build never stalls the event loop. The pool lives for the app lifespan.
+# forkserver, not fork: the server process already runs anyio/to_thread worker threads.
+# Windows (the DEPLOY.md quickstart) has no forkserver, only spawn.
+_PDF_POOL: Optional[ProcessPoolExecutor] = None
+_PDF_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _new_pdf_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context(_PDF_START_METHOD))
+
+async def _generate_and_save_pdf(pdf_payload: Dict[str, Any], brand: Dict[str, Any]) -> str:
+    global _PDF_POOL
     file_name = f"{uuid.uuid4().hex[:12]}.pdf"
     out_path = os.path.join(OUTPUT_DIR, file_name)
+    if _PDF_POOL is None:  # called outside the app lifespan (scripts / tests)
+        _PDF_POOL = _new_pdf_pool()
+    pool = _PDF_POOL
+    loop = asyncio.get_running_loop()
     try:
-        # Signature A: (payload, out_path=, brand_config=)
-        generate_pdf(pdf_payload, out_path=out_path, brand_config=brand)
-    except TypeError:
-        # Signature B: returns bytes
-        pdf_bytes = generate_pdf(**pdf_payload, **brand)
-        with open(out_path, "wb") as fh:
-            fh.write(pdf_bytes)
+        await loop.run_in_executor(pool, generate_pdf, pdf_payload, out_path, brand)
+    except BrokenProcessPool:
+        # A worker died (OOM/segfault) and the pool is unusable: replace it once and retry.
+        if _PDF_POOL is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            _PDF_POOL = _new_pdf_pool()
+        await loop.run_in_executor(_PDF_POOL, generate_pdf, pdf_payload, out_path, brand)
     return file_name
 
 @app.post("/form")
@@ -602,15 +680,8 @@ async def generate_pdf_response(
     tags_in: Dict[str, Any] = (gpt_response.get("hashtags") or {})
     captions: Dict[str, str] = {}
     hashtags_dict: Dict[str, List[str]] = {}
-    SPECIAL = {
-        "instagram": "Instagram",
-        "linkedin":  "LinkedIn",
-        "tiktok":    "TikTok",
-        "x":         "Twitter",
-        "facebook":  "Facebook",
-    }
     for slug in selected_slugs:
-        variants = {slug, slug.upper(), slug.capitalize(), SPECIAL.get(slug, "")}
+        variants = {slug, slug.upper(), slug.capitalize(), _PLATFORM_LABELS.get(slug, "")}
         variants = {v for v in variants if v}
         cap = ""
         for k in variants:
@@ -628,7 +699,7 @@ async def generate_pdf_response(
             if isinstance(v, list):
                 raw_tags = [str(x) for x in v]; break
             elif isinstance(v, str):
-                raw_tags = [p.strip() for p in re.split(r"[\s,]+", v) if p.strip()]; break
+                raw_tags = [p.strip() for p in _LIST_SPLIT_RX.split(v) if p.strip()]; break
         hashtags_dict[slug] = _apply_hashtag_rules(slug, raw_tags, cap or "")
         captions[slug] = cap
 
@@ -648,12 +719,12 @@ async def generate_pdf_response(
         "hero_hook": "Close 2–3 extra deals this quarter with AI.",
         "hero_cta":  "Get the free toolkit → content365.xyz/real-estate-ai",
     }
-    file_name = _generate_and_save_pdf(pdf_payload, brand)
+    file_name = await _generate_and_save_pdf(pdf_payload, brand)
 
-    if email and "@" in email and send_pdf_email:
+    if email and "@" in email and schedule_pdf_email:
         try:
             out_path = os.path.join(OUTPUT_DIR, file_name)
-            send_pdf_email(
+            schedule_pdf_email(
                 to_email=email, pdf_path=out_path,
                 subject="Your Content365 Marketing Pack",
                 body_text="Your PDF is attached. Thanks for using Content365!",
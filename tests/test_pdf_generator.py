@@ -1,6 +1,11 @@
 # tests/test_pdf_generator.py
 import os
-from utils.pdf_generator import generate_pdf
+import random
+import re
+import textwrap
+
+import pytest
+from utils.pdf_generator import generate_pdf, _generate_pdf_fallback, _wrap_line, _MiniPDF, _make_image_flowable
 
 def test_generate_basic(tmp_path):
     gpt = {
@@ -64,3 +69,86 @@ def test_wrapping_long_text(tmp_path):
     out = tmp_path / "wrap.pdf"
     path = generate_pdf(gpt, output_path=str(out), brand_config={"brand_name": "Content365"})
     assert out.exists() and out.stat().st_size > 500
+
+def test_returns_bytes_without_output_path():
+    """With no output_path the PDF is rendered in memory and returned as bytes."""
+    gpt = {"blog": {"title": "In Memory", "intro": "Intro", "bullets": ["A"]}}
+    data = generate_pdf(gpt, brand_config={"brand_name": "Content365"})
+    assert isinstance(data, bytes)
+    assert data.startswith(b"%PDF") and len(data) > 500
+
+# --- fallback writer: _wrap_line ---
+
+@pytest.mark.parametrize("line, expected", [
+    ("", [""]),                                    # blank
+    ("   ", [""]),                                 # whitespace-only
+    ("\t \n", [""]),
+    ("a b", ["a b"]),                              # short line unchanged
+    ("a   b", ["a b"]),                            # inner runs collapse on short lines too
+    ("a b  ", ["a b"]),                            # trailing whitespace dropped
+    ("abcde fghi", ["abcde fghi"]),                # exactly the width
+    ("abcde fghij", ["abcde", "fghij"]),           # one over the width
+    ("abcdefghijkl mn", ["abcdefghijkl", "mn"]),   # over-long first word is not broken
+    ("  ab cd ef", ["  ab cd ef"]),                # indent kept, exact width
+    ("  ab cd efg", ["  ab cd", "efg"]),           # indent only on the first line
+    ("  abcdefgh x", ["  abcdefgh", "x"]),         # indent + first word exactly fit
+    ("  abcdefghijkl mn", ["abcdefghijkl", "mn"]), # indent dropped when the first word can't share it
+    ("aa   bb   cc   dd", ["aa bb cc", "dd"]),     # long line, runs collapse
+])
+def test_wrap_line_table(line, expected):
+    assert _wrap_line(line, 10) == expected
+
+def test_wrap_line_matches_textwrap_on_single_spaced_text():
+    """For single-spaced text (nothing to normalize) the wrap is exactly textwrap's."""
+    rng = random.Random(365)
+    for _ in range(500):
+        words = ["x" * rng.randint(1, 14) for _ in range(rng.randint(1, 30))]
+        line = " " * rng.randint(0, 4) + " ".join(words)
+        width = rng.randint(5, 40)
+        expected = textwrap.wrap(line, width=width, break_long_words=False, break_on_hyphens=False)
+        assert _wrap_line(line, width) == expected, (line, width)
+
+# --- fallback writer: _MiniPDF structure ---
+
+def test_fallback_pdf_xref_and_page_count():
+    """Every xref offset points at its 'N 0 obj' and /Pages counts every page."""
+    bullets = [f"bullet {i}" for i in range(120)]
+    data = _generate_pdf_fallback({"blog": {"headline": "T", "bullets": bullets}}, None, {})
+    assert isinstance(data, bytes) and data.startswith(b"%PDF-") and data.rstrip().endswith(b"%%EOF")
+
+    startxref = int(re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", data).group(1))
+    assert data[startxref:].startswith(b"xref\n")
+    head = re.match(rb"xref\n0 (\d+)\n", data[startxref:])
+    size = int(head.group(1))
+    entries = data[startxref + head.end():].split(b"\n")[:size]
+    assert entries[0].startswith(b"0000000000 65535 f")
+    for num, entry in enumerate(entries[1:], start=1):
+        offset, _gen, kind = entry.split()[:3]
+        assert kind == b"n"
+        assert data[int(offset):].startswith(b"%d 0 obj" % num), num
+    assert re.search(rb"/Size %d\b" % size, data)
+
+    lines = 2 + len(bullets)  # title + blank + one line per bullet
+    expected_pages = -(-lines // _MiniPDF.LINES_PER_PAGE)
+    assert len(re.findall(rb"/Type /Page\b", data)) == expected_pages
+    count = int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", data).group(1))
+    assert count == expected_pages
+
+# --- images: JPEG passthrough ---
+
+def test_jpeg_passthrough_and_truncated_jpeg(tmp_path):
+    """A whole JPEG is embedded as-is; a truncated one (valid header) goes through the PIL repair."""
+    Image = pytest.importorskip("PIL.Image")
+    good = tmp_path / "good.jpg"
+    Image.effect_noise((300, 200), 64).convert("RGB").save(good, format="JPEG")
+    img = _make_image_flowable(str(good), os.stat(good), 200)
+    assert img is not None and img.imageWidth == 300 and img.filename == str(good)
+
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(good.read_bytes()[: good.stat().st_size // 2])
+    img = _make_image_flowable(str(bad), os.stat(bad), 200)
+    assert img is not None and img.filename != str(bad)  # re-encoded PNG, not the raw file
+
+    gpt = {"blog": {"title": "T", "body": f'<img src="{bad}"> after'}}
+    data = generate_pdf(gpt, output_path=None, brand_config={})
+    assert data.startswith(b"%PDF-")
@@ -0,0 +1,169 @@
+# tests/test_send_email.py
+import asyncio
+import base64
+import json
+import os
+
+import httpx
+import pytest
+
+import utils.send_email as se
+
+
+@pytest.fixture
+def sendgrid(monkeypatch):
+    """Configured sender whose shared client talks to a MockTransport instead of SendGrid."""
+    monkeypatch.setenv("SENDGRID_API_KEY", "SG.test")
+    monkeypatch.setenv("FROM_EMAIL", "packs@content365.xyz")
+    monkeypatch.setenv("FROM_NAME", "Content365")
+    se.refresh_env()
+    se._encoded_pdf.cache_clear()
+    monkeypatch.setattr(se.random, "uniform", lambda a, b: 0.0)  # no real backoff sleeps
+
+    sent = []
+    statuses = []  # status codes (or exception types) to answer with, in order; then 202
+
+    def handler(request):
+        sent.append(request)
+        nxt = statuses.pop(0) if statuses else 202
+        if isinstance(nxt, type):
+            raise nxt("mock", request=request)
+        return httpx.Response(nxt)
+
+    client = httpx.AsyncClient(base_url=se._SENDGRID_BASE_URL, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(se, "_client", client)
+    yield sent, statuses
+    se.refresh_env()
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    p = tmp_path / "pack.pdf"
+    p.write_bytes(b"%PDF-1.4\n" + os.urandom(1000) + b"\n%%EOF\n")
+    return str(p)
+
+
+def _body(request):
+    return json.loads(request.content)
+
+
+def test_payload_shape(sendgrid, pdf):
+    sent, _ = sendgrid
+    assert asyncio.run(se.send_pdf_email("buyer@example.com", pdf, "Your pack", "Hi"))
+    (req,) = sent
+    assert str(req.url) == "https://api.sendgrid.com/v3/mail/send"
+    assert req.headers["authorization"] == "Bearer SG.test"
+    assert req.headers["content-type"] == "application/json"
+    body = _body(req)
+    assert body["personalizations"] == [{"to": [{"email": "buyer@example.com"}]}]
+    assert body["from"] == {"email": "packs@content365.xyz", "name": "Content365"}
+    assert body["subject"] == "Your pack"
+    assert body["content"] == [{"type": "text/plain", "value": "Hi"}]
+    (att,) = body["attachments"]
+    assert att["filename"] == "pack.pdf"
+    assert att["type"] == "application/pdf" and att["disposition"] == "attachment"
+    with open(pdf, "rb") as f:
+        assert base64.b64decode(att["content"]) == f.read()
+
+
+def test_default_subject_and_body(sendgrid, pdf):
+    sent, _ = sendgrid
+    assert asyncio.run(se.send_pdf_email("buyer@example.com", pdf, ""))
+    body = _body(sent[0])
+    assert body["subject"] == se._DEFAULT_SUBJECT
+    assert body["content"][0]["value"] == se._DEFAULT_BODY
+
+
+def test_bulk_batches_at_1000_and_dedupes(sendgrid, pdf):
+    sent, _ = sendgrid
+    recipients = [f"user{i}@example.com" for i in range(2500)]
+    recipients += ["user1@example.com", " user2@example.com ", "", "   "]
+    assert asyncio.run(se.send_pdf_email_bulk(recipients, pdf, "S"))
+    sizes = [len(_body(r)["personalizations"]) for r in sent]
+    assert sizes == [1000, 1000, 500]
+    emails = [p["to"][0]["email"] for r in sent for p in _body(r)["personalizations"]]
+    assert emails == [f"user{i}@example.com" for i in range(2500)]
+
+
+def test_bulk_fails_if_any_batch_rejected(sendgrid, pdf):
+    sent, statuses = sendgrid
+    statuses[:] = [202, 400]
+    recipients = [f"user{i}@example.com" for i in range(1500)]
+    assert not asyncio.run(se.send_pdf_email_bulk(recipients, pdf, "S"))
+    assert len(sent) == 2
+
+
+def test_preflight_missing_config(sendgrid, pdf, monkeypatch):
+    sent, _ = sendgrid
+    monkeypatch.setenv("SENDGRID_API_KEY", "")
+    se.refresh_env()
+    assert not asyncio.run(se.send_pdf_email("buyer@example.com", pdf, "S"))
+    assert sent == []
+
+
+def test_preflight_missing_file_or_recipient(sendgrid, tmp_path, pdf):
+    sent, _ = sendgrid
+    assert not asyncio.run(se.send_pdf_email("buyer@example.com", str(tmp_path / "nope.pdf"), "S"))
+    assert not asyncio.run(se.send_pdf_email("", pdf, "S"))
+    assert sent == []
+
+
+def test_preflight_size_cap(sendgrid, pdf, monkeypatch):
+    sent, _ = sendgrid
+    monkeypatch.setattr(se, "_MAX_MESSAGE_BYTES", se._b64_len(os.path.getsize(pdf)) - 1)
+    assert not asyncio.run(se.send_pdf_email("buyer@example.com", pdf, "S"))
+    assert sent == []
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, se._B64_CHUNK - 1, se._B64_CHUNK, se._B64_CHUNK + 1,
+                                  2 * se._B64_CHUNK + 2, 5 * se._B64_CHUNK])
+def test_b64_file_matches_stdlib(tmp_path, size):
+    p = tmp_path / "blob.bin"
+    data = os.urandom(size)
+    p.write_bytes(data)
+    expected = base64.b64encode(data).decode("ascii")
+    assert se._b64_file(str(p), size) == expected
+    # a stale size hint (file changed after stat) still yields the right encoding
+    assert se._b64_file(str(p), size + 100) == expected
+    assert se._b64_file(str(p), 0) == expected
+
+
+@pytest.mark.parametrize("statuses, calls, ok", [
+    ([202], 1, True),
+    ([400], 1, False),
+    ([401], 1, False),
+    ([413], 1, False),
+    ([429, 503, 202], 3, True),
+    ([httpx.ConnectError, 202], 2, True),
+    ([httpx.ReadTimeout], 1, False),  # may have been accepted: never resend
+    ([500] * 5, 5, False),
+])
+def test_retry_only_transient_failures(sendgrid, pdf, statuses, calls, ok):
+    sent, queued = sendgrid
+    queued[:] = statuses
+    assert asyncio.run(se._send_with_retry("buyer@example.com", pdf, "S", None)) is ok
+    assert len(sent) == calls
+
+
+def test_schedule_then_aclose(sendgrid, pdf):
+    sent, _ = sendgrid
+
+    async def run():
+        assert se.schedule_pdf_email("buyer@example.com", pdf, "S")
+        assert len(se._pending) == 1
+        await se.aclose()
+
+    asyncio.run(run())
+    assert len(sent) == 1
+    assert not se._pending
+    assert se._client is None
+
+
+def test_schedule_rejects_unsendable(sendgrid, tmp_path):
+    sent, _ = sendgrid
+
+    async def run():
+        return se.schedule_pdf_email("buyer@example.com", str(tmp_path / "nope.pdf"), "S")
+
+    assert asyncio.run(run()) is False
+    assert not se._pending and sent == []
@@ -1,4 +1,12 @@
+import asyncio
+import json
+import multiprocessing
+import os
 import re
+
+import httpx
+import pytest
+import main
 from main import _fix_ai_casing, _valid_platforms
 
 def test_fix_ai_casing():
@@ -10,3 +18,81 @@ def test_valid_platforms_order_and_dedupe():
     seq = ["Instagram","instagram","LinkedIn","X","X","Facebook"]
     slugs = _valid_platforms([p.lower() for p in seq])
     assert slugs == ["instagram","linkedin","x","facebook"]
+
+# --- PDF process pool ---
+
+@pytest.mark.parametrize("start_method", [m for m in ("forkserver", "spawn") if m in multiprocessing.get_all_start_methods()])
+def test_pdf_pool_renders_and_recovers_from_broken_pool(tmp_path, monkeypatch, start_method):
+    """_generate_and_save_pdf renders in the pool, and rebuilds it once a worker has died."""
+    monkeypatch.setattr(main, "_PDF_START_METHOD", start_method)
+    monkeypatch.setattr(main, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "_PDF_POOL", None)
+    payload = {"blog": {"title": "Title", "intro": "Intro", "bullets": ["A", "B"], "cta": "Do thing"}}
+    try:
+        name = asyncio.run(main._generate_and_save_pdf(payload, {"brand_name": "Content365"}))
+        assert os.path.getsize(tmp_path / name) > 500
+        pool = main._PDF_POOL
+        assert pool is not None
+
+        for proc in list(pool._processes.values()):  # simulate an OOM kill / segfault
+            proc.kill()
+            proc.join()
+        name = asyncio.run(main._generate_and_save_pdf(payload, {"brand_name": "Content365"}))
+        assert os.path.getsize(tmp_path / name) > 500
+        assert main._PDF_POOL is not pool
+    finally:
+        if main._PDF_POOL is not None:
+            main._PDF_POOL.shutdown(wait=True, cancel_futures=True)
+
+# --- local LLM retries ---
+
+@pytest.mark.parametrize("statuses, calls, ok", [
+    ([200], 1, True),
+    ([429, 503, 200], 3, True),
+    ([httpx.ConnectError, 200], 2, True),
+    ([httpx.ConnectTimeout, httpx.PoolTimeout, 200], 3, True),
+    ([429, 429, 429], 3, False),
+    ([400], 1, False),
+    ([httpx.ReadTimeout], 1, False),
+])
+def test_post_llm_retries_only_transient_failures(monkeypatch, statuses, calls, ok):
+    sent = []
+    queued = list(statuses)
+
+    def handler(request):
+        sent.append(request)
+        nxt = queued.pop(0)
+        if isinstance(nxt, type):
+            raise nxt("mock", request=request)
+        return httpx.Response(nxt, json={"choices": [{"message": {"content": "{}"}}]})
+
+    monkeypatch.setattr(main, "LLM_API_URL", "http://llm.test/v1/chat/completions")
+    monkeypatch.setattr(main, "_LLM_CLIENT", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(main.random, "uniform", lambda a, b: 0.0)  # no real backoff sleeps
+
+    async def run():
+        try:
+            return await main._post_llm({"Content-Type": "application/json"}, {"model": "m"})
+        except httpx.HTTPError:
+            return None
+
+    data = asyncio.run(run())
+    assert (data is not None) is ok
+    assert len(sent) == calls
+
+@pytest.mark.parametrize("json_mode", [False, True])
+def test_local_llm_json_mode(monkeypatch, json_mode):
+    bodies = []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200, json={"choices": [{"message": {"content": '{"ok": 1}'}}]})
+
+    monkeypatch.setattr(main, "LLM_API_URL", "http://llm.test/v1/chat/completions")
+    monkeypatch.setattr(main, "LLM_MODEL", "m")
+    monkeypatch.setattr(main, "LLM_JSON_MODE", json_mode)
+    monkeypatch.setattr(main, "_LLM_CLIENT", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    assert asyncio.run(main._call_local_llm("prompt")) == '{"ok": 1}'
+    (body,) = bodies
+    assert body.get("response_format") == ({"type": "json_object"} if json_mode else None)
@@ -3,6 +3,15 @@
 from __future__ import annotations
 from typing import List
 
+# recommended caps (conservative, revenue-safe)
+_CAPS = {
+    "instagram": 12,  # rec. 8–12; hard cap 12 to avoid spammy look
+    "tiktok": 5,
+    "linkedin": 5,
+    "x": 2,           # Twitter/X: keep it ultra short
+    "facebook": 5,
+}
+
 def _norm_platform(slug: str) -> str:
     s = (slug or "").strip().lower()
     return "x" if s in {"x", "twitter"} else s
@@ -16,16 +25,6 @@ def _clean_tag(t: str) -> str:
             out.append(ch.lower())
     return "".join(out)
 
-def _dedupe_preserve(seq: List[str]) -> List[str]:
-    seen = set()
-    out = []
-    for t in seq:
-        k = t.lower()
-        if k and k not in seen:
-            seen.add(k)
-            out.append(t)
-    return out
-
 def _extract_inline_hashtags(text: str) -> List[str]:
     if not text:
         return []
@@ -50,22 +49,11 @@ def enforce_hashtag_rules(platform_slug: str,
     Normalize and clamp hashtags by platform.
     Returns a *list without leading #*, caller can render with '#'+tag.
     """
-    p = _norm_platform(platform_slug)
-
-    # recommended caps (conservative, revenue-safe)
-    caps = {
-        "instagram": 12,  # rec. 8–12; hard cap 12 to avoid spammy look
-        "tiktok": 5,
-        "linkedin": 5,
-        "x": 2,           # Twitter/X: keep it ultra short
-        "facebook": 5,
-    }
-    max_n = caps.get(p, 8)
+    max_n = _CAPS.get(_norm_platform(platform_slug), 8)
 
     # clean + dedupe
-    cleaned = [_clean_tag(t) for t in (tags or [])]
-    cleaned = [t for t in cleaned if t]
-    cleaned = _dedupe_preserve(cleaned)
+    # _clean_tag already lowercases, so an ordered dict.fromkeys dedupes case-insensitively
+    cleaned = list(dict.fromkeys(filter(None, map(_clean_tag, tags or []))))
 
     # drop tags already inline in the caption
     if caption_text:
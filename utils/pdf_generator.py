@@ -16,11 +16,13 @@ from __future__ import annotations
 
 import io
 import os
+import functools
+import itertools
 import re
 import uuid
 import shutil
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 
 # --------------------- ReportLab imports (premium engine) ---------------------
@@ -104,7 +106,6 @@ def _register_fonts() -> dict:
         "/Library/Fonts",
         "C:\\Windows\\Fonts",
     ]
-    FONT_DIRS = [p for p in FONT_DIRS if p and os.path.isdir(p)]
     candidates = {
         "regular": ["DejaVuSans.ttf"],
         "bold": ["DejaVuSans-Bold.ttf"],
@@ -112,19 +113,29 @@ def _register_fonts() -> dict:
         "bold_italic": ["DejaVuSans-BoldOblique.ttf", "DejaVuSans-BoldItalic.ttf"],
     }
     found: Dict[str, str] = {}
-    for role, names in candidates.items():
-        for base in FONT_DIRS:
-            for fname in names:
-                path = os.path.join(base, fname)
-                if os.path.isfile(path) and os.path.getsize(path) > 1024:
-                    try:
-                        pdfmetrics.registerFont(TTFont(f"DejaVu-{role}", path))
-                        found[role] = f"DejaVu-{role}"
-                        break
-                    except Exception:
-                        pass
+    # One readdir per directory (a missing dir is just an OSError); stop once every role is filled.
+    for base in FONT_DIRS:
+        if not base:
+            continue
+        try:
+            entries = {e.name: e for e in os.scandir(base) if e.name.lower().endswith(".ttf")}
+        except OSError:
+            continue
+        for role, names in candidates.items():
             if role in found:
-                break
+                continue
+            for fname in names:
+                entry = entries.get(fname)
+                try:
+                    if entry is None or not entry.is_file() or entry.stat().st_size <= 1024:
+                        continue
+                    pdfmetrics.registerFont(TTFont(f"DejaVu-{role}", entry.path))
+                    found[role] = f"DejaVu-{role}"
+                    break
+                except Exception:
+                    pass
+        if len(found) == len(candidates):
+            break
     if {"regular", "bold"} <= set(found):
         return {
             "regular": found["regular"],
@@ -153,40 +164,60 @@ _EMOJI_MAP = {
     "📣":"[CTA]", "🔗":"[link]", "💡":"[idea]",
     "⭐":"*", "🔥":"[hot]", "🚀":"[launch]", "📈":"[up]", "👇":"↓",
 }
-# Broad emoji ranges (BMP + common symbols)
-_EMOJI_RANGES = [(0x1F300,0x1FAFF), (0x1F1E6,0x1F1FF), (0x2600,0x27BF)]
-
-def _looks_like_emoji(ch: str) -> bool:
-    cp = ord(ch)
-    if cp in (0xFE0E, 0xFE0F):  # variation selectors
-        return True
-    for a, b in _EMOJI_RANGES:
-        if a <= cp <= b:
-            return True
-    return False
+# Single-codepoint mappings go through one str.translate; the two "+U+FE0F" sequences need replace.
+_EMOJI_TRANS = str.maketrans({k: v for k, v in _EMOJI_MAP.items() if len(k) == 1})
+_EMOJI_SEQS = [(k, v) for k, v in _EMOJI_MAP.items() if len(k) > 1]
+# Broad emoji ranges (BMP + common symbols) and variation selectors
+_EMOJI_RANGES = ((0x1F300, 0x1FAFF), (0x1F1E6, 0x1F1FF), (0x2600, 0x27BF), (0xFE0E, 0xFE0F))
+_EMOJI_RE = re.compile("[" + "".join(f"{chr(a)}-{chr(b)}" for a, b in _EMOJI_RANGES) + "]")
+# Helvetica mode maps and strips in the same translate: emoji code points delete, and map
+# targets are pre-stripped (e.g. ✅ -> ✔ is itself an emoji, so it becomes "").
+_EMOJI_STRIP_TRANS: Dict[int, Optional[str]] = {cp: None for a, b in _EMOJI_RANGES for cp in range(a, b + 1)}
+_EMOJI_STRIP_TRANS.update((ord(k), _EMOJI_RE.sub("", v)) for k, v in _EMOJI_MAP.items() if len(k) == 1)
+_DEJAVU_ACTIVE = "dejavu" in _FONTS["regular"].lower()
 
 def _sanitize_for_font(s: str) -> str:
     """Map/strip emoji only when DejaVu is NOT active (Helvetica fallback)."""
     if not isinstance(s, str):
         s = str(s or "")
-    for k, v in _EMOJI_MAP.items():
-        s = s.replace(k, v)
-    if "dejavu" not in _FONTS["regular"].lower():
-        s = "".join(ch for ch in s if not _looks_like_emoji(ch))
-    return s
+    if s.isascii():  # nothing to map or strip
+        return s
+    return _sanitize_non_ascii(s)
+
+@functools.lru_cache(maxsize=4096)
+def _sanitize_non_ascii(s: str) -> str:
+    """Slow path of _sanitize_for_font; cached because platform names, brand and footer strings repeat."""
+    if _DEJAVU_ACTIVE:
+        s = s.translate(_EMOJI_TRANS)
+        if "\ufe0f" in s:
+            for k, v in _EMOJI_SEQS:
+                s = s.replace(k, v)
+        return s
+    # The FE0F sequences map to non-emoji ("➡️" -> "→"), so resolve them before the strip pass.
+    if "\ufe0f" in s:
+        for k, v in _EMOJI_SEQS:
+            s = s.replace(k, v)
+    return s.translate(_EMOJI_STRIP_TRANS)
 
 # -----------------------------------------------------------------------------
 # Styles
 # -----------------------------------------------------------------------------
 if _HAS_REPORTLAB:
+    # Fixed palette, parsed once; the page callbacks reuse these on every page.
+    _INK   = colors.HexColor("#111827")
+    _GREY5 = colors.HexColor("#555555")
+    _GREY6 = colors.HexColor("#666666")
+    _RULE  = colors.HexColor("#E5E7EB")
+    _FAINT = colors.HexColor("#EEEEEE")
+
     _ss = getSampleStyleSheet()
     TITLE = ParagraphStyle("C365_Title", parent=_ss["Title"],   fontName=FACE_B, fontSize=22, leading=26, spaceAfter=6)
-    SUB   = ParagraphStyle("C365_Sub",   parent=_ss["Normal"],  fontName=FACE,   fontSize=12.5, textColor=colors.HexColor("#666666"), spaceAfter=12)
+    SUB   = ParagraphStyle("C365_Sub",   parent=_ss["Normal"],  fontName=FACE,   fontSize=12.5, textColor=_GREY6, spaceAfter=12)
     H2    = ParagraphStyle("C365_H2",    parent=_ss["Heading2"],fontName=FACE_B, fontSize=15, spaceBefore=8, spaceAfter=4)
     BODY  = ParagraphStyle("C365_Body",  parent=_ss["BodyText"],fontName=FACE,   fontSize=11, leading=15, spaceAfter=8)
-    SMALL = ParagraphStyle("C365_Small", parent=_ss["Normal"],  fontName=FACE,   fontSize=9.5, leading=12, textColor=colors.HexColor("#555555"))
+    SMALL = ParagraphStyle("C365_Small", parent=_ss["Normal"],  fontName=FACE,   fontSize=9.5, leading=12, textColor=_GREY5)
     TAGS  = ParagraphStyle("C365_Tags",  parent=_ss["Normal"],  fontName=FACE,   fontSize=10, leading=13, textColor=colors.HexColor("#0B6BF2"), spaceBefore=2, spaceAfter=8)
-    CTA   = ParagraphStyle("C365_CTA",   parent=_ss["BodyText"],fontName=FACE_B, fontSize=12, leading=15, textColor=colors.HexColor("#111827"), spaceBefore=6, spaceAfter=10)
+    CTA   = ParagraphStyle("C365_CTA",   parent=_ss["BodyText"],fontName=FACE_B, fontSize=12, leading=15, textColor=_INK, spaceBefore=6, spaceAfter=10)
 
     CAPTION = ParagraphStyle(
         "C365_Caption",
@@ -203,51 +234,85 @@ else:
     # Dummy placeholders so references exist; they won't be used in fallback path.
     class _DummyStyle: pass
     TITLE = SUB = H2 = BODY = SMALL = TAGS = CTA = CAPTION = _DummyStyle()
+    _INK = _GREY5 = _GREY6 = _RULE = _FAINT = None
 
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
+_HEX_RX = re.compile(r"#?[0-9A-Fa-f]{6}")
+
 def _hex(c: Optional[str], default: str) -> str:
     """
     Validate and normalize to '#RRGGBB'; fall back to `default` if invalid.
     Accepts 'RRGGBB' or '#RRGGBB' and returns '#RRGGBB'.
     """
     c = (c or "").strip()
-    if re.fullmatch(r"#?[0-9A-Fa-f]{6}", c):
+    if _HEX_RX.fullmatch(c):
         return c if c.startswith("#") else f"#{c}"
     return default
 
-# Bare URL recognizer (skip things already inside href="...").
-_A_RX = re.compile(r'(?<!")\b((?:https?://|www\.)\S+)', re.I)
+@functools.lru_cache(maxsize=64)
+def _color(hex_str: str) -> Any:
+    """ReportLab colour for a '#RRGGBB' string; brand/platform palettes are small, so parse each once."""
+    return colors.HexColor(hex_str)
+
+_HAS_SCHEME_RX = re.compile(r"https?://", re.I)
+
+def _with_scheme(url: str) -> str:
+    """`url` unchanged if it already has an http(s) scheme (any case), else prefixed with https://."""
+    return url if _HAS_SCHEME_RX.match(url) else f"https://{url}"
+
+# Emails and bare URLs (skipping things already inside href="...") in one alternation,
+# so each string is scanned once and a URL is never re-matched inside a fresh mailto anchor.
+_LINKIFY_RX = re.compile(
+    r'(?P<email>[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})'
+    r'|(?P<url>(?<!")\b(?:https?://|www\.)\S+)',
+    re.I,
+)
+
+def _linkify(m: "re.Match") -> str:
+    s = m.group(0)
+    if m.lastgroup == "email":
+        return f'<a href="mailto:{s}">{s}</a>'
+    return f'<a href="{_with_scheme(s)}">{s}</a>'
 
 def _auto_link(text: str) -> str:
     """Wrap bare URLs/emails with <a> if user didn’t include anchor tags."""
     if not text:
         return ""
-    # Emails
-    text = re.sub(r'([A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})', r'<a href="mailto:\1">\1</a>', text)
-    # Bare URLs
-    def repl(m):
-        s = m.group(1)
-        href = s if s.lower().startswith(("http://", "https://")) else f"https://{s}"
-        return f'<a href="{href}">{s}</a>'
-    return _A_RX.sub(repl, text)
+    # Cheap substring prefilters: most copy has neither an email nor a URL,
+    # and text the author already anchored is left alone.
+    if len(text) < 8:
+        return text
+    lowered = text.lower()
+    if "<a " in lowered:
+        return text
+    if "@" not in text and "http" not in lowered and "www." not in lowered:
+        return text
+    return _LINKIFY_RX.sub(_linkify, text)
+
+_UNSAFE_TAG_RX = re.compile(r"</?(script|style|iframe|object|embed|meta|link)[^>]*>", re.I)
 
 def _safe_html(html: str) -> str:
     if not html:
         return ""
-    html = re.sub(r"</?(script|style|iframe|object|embed|meta|link)[^>]*>", "", html, flags=re.I)
-    html = html.replace("\r", "")
+    if "<" in html:
+        html = _UNSAFE_TAG_RX.sub("", html)
+    if "\r" in html:
+        html = html.replace("\r", "")
     return html
 
+@functools.lru_cache(maxsize=64)
+def _img_reader_cached(path: str, mtime_ns: int) -> "ImageReader":
+    """One decoded ImageReader per (file, mtime); header logos are drawn on every page."""
+    return ImageReader(path)
+
 def _img_reader(path: Optional[str]) -> Optional["ImageReader"]:
     if not path:
         return None
     try:
-        p = Path(path)
-        if p.exists():
-            return ImageReader(str(p))
-        return None
+        st = os.stat(path)
+        return _img_reader_cached(os.path.abspath(path), st.st_mtime_ns)
     except Exception:
         return None
 
@@ -261,7 +326,7 @@ _PLATFORM_COLORS = {
     "facebook":  "#1877F2",
 }
 def _platform_color(name: str, fallback: str = "#0B6BF2") -> Any:
-    return colors.HexColor(_PLATFORM_COLORS.get(name.lower(), fallback))
+    return _color(_PLATFORM_COLORS.get(name.lower(), fallback))
 
 # -----------------------------------------------------------------------------
 # Header / Footer / Watermark / Debug grid
@@ -282,71 +347,98 @@ def _draw_qr(canvas: Canvas, x: float, y: float, size: float, url: str) -> None:
         renderPDF.draw(d, canvas, x, y)
         # Clickable link over QR
         canvas.linkURL(
-            url if str(url).lower().startswith(("http://", "https://")) else f"https://{url}",
+            _with_scheme(str(url)),
             (x, y, x + size, y + size), relative=0, thickness=0, color=None
         )
     except Exception:
         pass
 
-def _draw_header(canvas: "Canvas", doc, brand: Dict[str, Any], title_text: str):
+_LOGO_FALLBACKS = (
+    "static/content365_logo.png",
+    "static/content365-logo.png",
+    "assets/content365_logo.png",
+    "assets/content365-logo.png",
+    "static/logo.png",
+    "assets/logo.png",
+)
+
+def _resolve_logo(logo_path: Optional[str]) -> Optional["ImageReader"]:
+    """Brand logo, else the first bundled fallback that loads; None if nothing does."""
+    logo = _img_reader(logo_path)
+    if not logo:
+        for _candidate in _LOGO_FALLBACKS:
+            logo = _img_reader(_candidate)
+            if logo:
+                break
+    return logo
+
+def _logo_size(logo: "ImageReader", max_h: Any) -> Optional[Tuple[float, float]]:
+    """Drawn (w, h) for the header logo: scaled down to `max_h`, never up; None if unreadable."""
+    try:
+        iw, ih = logo.getSize()
+        s = min(1.0, float(max_h) / float(ih))
+        return float(iw) * s, float(ih) * s
+    except Exception:
+        return None
+
+def _prepare_header(brand: Dict[str, Any], title_text: str) -> Dict[str, Any]:
+    """Per-document header values (sanitized strings, link target, measured widths)."""
+    website_raw = (brand.get("website") or "content365.xyz").strip()
+    website = _sanitize_for_font(website_raw)
+    title = _sanitize_for_font(title_text)
+    logo = _resolve_logo(brand.get("logo_path"))
+    return {
+        "primary":   _color(_hex(brand.get("primary_color"), "#0B6BF2")),
+        "brand_name": _sanitize_for_font(brand.get("brand_name", "Content365")),
+        "website":   website,
+        "website_w": pdfmetrics.stringWidth(website, FACE, 9.5) if website else 0.0,
+        "site_href": _with_scheme(website_raw),
+        "title":     title,
+        "title_w":   pdfmetrics.stringWidth(title, FACE_B, 10.5),
+        "logo":      logo,
+        "logo_wh":   _logo_size(logo, brand.get("logo_max_h", 20)) if logo else None,
+    }
+
+def _draw_header(canvas: "Canvas", doc, brand: Dict[str, Any], header: Dict[str, Any]):
     canvas.saveState()
     page_w, page_h = canvas._pagesize
-    primary = colors.HexColor(_hex(brand.get("primary_color"), "#0B6BF2"))
 
     # top strip
     strip_h = 10
-    canvas.setFillColor(primary)
+    canvas.setFillColor(header["primary"])
     canvas.rect(0, page_h - strip_h, page_w, strip_h, fill=1, stroke=0)
 
     # brand + site
-    brand_name = _sanitize_for_font(brand.get("brand_name", "Content365"))
-    website_raw = (brand.get("website") or "content365.xyz").strip()
-    website = _sanitize_for_font(website_raw)
-    site_href = website_raw if website_raw.lower().startswith(("http://", "https://")) else f"https://{website_raw}"
-
+    website = header["website"]
     x = doc.leftMargin
     y = page_h - strip_h - 14
 
-    canvas.setFont(FACE_B, 12)
-    canvas.setFillColor(colors.black)
-    canvas.drawString(x, y, brand_name)
-
-    canvas.setFont(FACE, 9.5)
     y2 = y - 12
-    canvas.setFillColor(colors.HexColor("#555555"))
-    canvas.drawString(x, y2, website)
-    if website:
-        w = canvas.stringWidth(website, FACE, 9.5)
-        canvas.linkURL(site_href, (x, y2 - 2, x + w, y2 + 10), relative=0, thickness=0, color=None)
-
-    # title (right)
-    canvas.setFont(FACE_B, 10.5)
-    canvas.setFillColor(colors.HexColor("#111827"))
     right_x = page_w - doc.rightMargin
-    canvas.drawRightString(right_x, y, _sanitize_for_font(title_text))
 
-    # logo (optional with fallbacks)
-    logo = _img_reader(brand.get("logo_path"))
-    if not logo:
-        for _candidate in (
-            "static/content365_logo.png",
-            "static/content365-logo.png",
-            "assets/content365_logo.png",
-            "assets/content365-logo.png",
-            "static/logo.png",
-            "assets/logo.png",
-        ):
-            logo = _img_reader(_candidate)
-            if logo:
-                break
+    # brand, title (right-aligned via its precomputed width) and site share one BT/ET text object
+    t = canvas.beginText(x, y)
+    t.setFont(FACE_B, 12)
+    t.setFillColor(colors.black)
+    t.textOut(header["brand_name"])
+    t.setTextOrigin(right_x - header["title_w"], y)
+    t.setFont(FACE_B, 10.5)
+    t.setFillColor(_INK)
+    t.textOut(header["title"])
+    t.setTextOrigin(x, y2)
+    t.setFont(FACE, 9.5)
+    t.setFillColor(_GREY5)
+    t.textOut(website)
+    canvas.drawText(t)
+    if website:
+        w = header["website_w"]
+        canvas.linkURL(header["site_href"], (x, y2 - 2, x + w, y2 + 10), relative=0, thickness=0, color=None)
 
-    if logo:
+    # logo (resolved once per document in _prepare_header)
+    logo = header["logo"]
+    if logo and header["logo_wh"]:
         try:
-            iw, ih = logo.getSize()
-            max_h = float(brand.get("logo_max_h", 20))
-            s = min(1.0, max_h / float(ih))
-            w = float(iw) * s
-            h = float(ih) * s
+            w, h = header["logo_wh"]
             lx = right_x - w
             ly = y2 - 2
             canvas.drawImage(logo, lx, ly, width=w, height=h, mask="auto")
@@ -355,31 +447,43 @@ def _draw_header(canvas: "Canvas", doc, brand: Dict[str, Any], title_text: str):
 
     canvas.restoreState()
 
-def _draw_footer(canvas: Canvas, doc, footer_text: str, brand: Dict[str, Any]):
+_FOOTER_URL_RX = re.compile(r'(https?://\S+|[A-Za-z0-9.-]+\.[A-Za-z]{2,})')
+
+def _prepare_footer(footer_text: str) -> Tuple[str, Optional[str], float]:
+    """Sanitize the (static) footer once per document: returns (text, first URL or None, text width)."""
+    footer_text = _sanitize_for_font(footer_text) if footer_text else ""
+    if not footer_text:
+        return "", None, 0.0
+    url = None
+    m = _FOOTER_URL_RX.search(footer_text)
+    if m:
+        url = _with_scheme(m.group(1))
+    return footer_text, url, pdfmetrics.stringWidth(footer_text, FACE, 9)
+
+def _draw_footer(canvas: Canvas, doc, footer_text: str, footer_url: Optional[str], footer_w: float,
+                 brand: Dict[str, Any]):
     if not footer_text:
         return
-    footer_text = _sanitize_for_font(footer_text)
     canvas.saveState()
     page_w, _ = canvas._pagesize
-    canvas.setStrokeColor(colors.HexColor("#E5E7EB"))
+    canvas.setStrokeColor(_RULE)
     canvas.line(doc.leftMargin, doc.bottomMargin - 8, page_w - doc.rightMargin, doc.bottomMargin - 8)
-    canvas.setFont(FACE, 9)
-    canvas.setFillColor(colors.HexColor("#666666"))
     x = doc.leftMargin
     y = doc.bottomMargin - 22
-    canvas.drawString(x, y, footer_text)
 
-    # make first URL clickable, if any
-    m = re.search(r'(https?://\S+|[A-Za-z0-9.-]+\.[A-Za-z]{2,})', footer_text)
-    if m:
-        url = m.group(1)
-        if not url.lower().startswith(("http://", "https://")):
-            url = "https://" + url
-        w = canvas.stringWidth(footer_text, FACE, 9)
-        canvas.linkURL(url, (x, y-2, x + w, y+10), relative=0, thickness=0, color=None)
+    # footer text + right-aligned page number in one text object
+    page_label = f"Page {canvas.getPageNumber()}"
+    t = canvas.beginText(x, y)
+    t.setFont(FACE, 9)
+    t.setFillColor(_GREY6)
+    t.textOut(footer_text)
+    t.setTextOrigin(page_w - doc.rightMargin - pdfmetrics.stringWidth(page_label, FACE, 9), y)
+    t.textOut(page_label)
+    canvas.drawText(t)
 
-    # Page number
-    canvas.drawRightString(page_w - doc.rightMargin, y, f"Page {canvas.getPageNumber()}")
+    # make first URL clickable, if any
+    if footer_url:
+        canvas.linkURL(footer_url, (x, y-2, x + footer_w, y+10), relative=0, thickness=0, color=None)
 
     # Optional QR in footer
     try:
@@ -401,7 +505,7 @@ def _draw_watermark(canvas: Canvas, doc, text: str):
     canvas.saveState()
     page_w, page_h = canvas._pagesize
     canvas.setFont(FACE_B, 50)
-    canvas.setFillColor(colors.HexColor("#EEEEEE"))
+    canvas.setFillColor(_FAINT)
     canvas.translate(page_w/2, page_h/2)
     canvas.rotate(30)
     canvas.drawCentredString(0, 0, text)
@@ -410,7 +514,7 @@ def _draw_watermark(canvas: Canvas, doc, text: str):
 def _draw_debug_grid(canvas: "Canvas", doc):
     canvas.saveState()
     page_w, page_h = canvas._pagesize
-    canvas.setStrokeColor(colors.HexColor("#EEEEEE"))
+    canvas.setStrokeColor(_FAINT)
     x0, x1 = doc.leftMargin, page_w - doc.rightMargin
     y0, y1 = doc.bottomMargin, page_h - doc.topMargin
     step = 36
@@ -427,6 +531,8 @@ def _draw_debug_grid(canvas: "Canvas", doc):
 # -----------------------------------------------------------------------------
 # Flowable builders
 # -----------------------------------------------------------------------------
+_TAG_STRIP_RE = re.compile(r"<[^>]+>")
+
 def _make_para(text: str, style: ParagraphStyle) -> Paragraph:
     """
     Safe Paragraph builder: try rich text; on failure, strip tags and retry.
@@ -436,17 +542,14 @@ def _make_para(text: str, style: ParagraphStyle) -> Paragraph:
         return Paragraph(text, style)
     except Exception:
         try:
-            plain = re.sub(r"<[^>]+>", "", text or "")
+            plain = _TAG_STRIP_RE.sub("", text or "")
             return Paragraph(_sanitize_for_font(plain), style)
         except Exception:
             return Paragraph(_sanitize_for_font("[content error]"), style)
 
-def _platform_banner(name: str) -> "Table":
-    txt = f"  {name}  "
-    tbl = Table([[txt]], colWidths=["*"])
-    col = _platform_color(name)
-    tbl.setStyle(TableStyle([
-        ("BACKGROUND",  (0,0), (-1,-1), col),
+# Shared table styles; only the per-call colours are layered on top.
+if _HAS_REPORTLAB:
+    _BANNER_BASE = TableStyle([
         ("TEXTCOLOR",   (0,0), (-1,-1), colors.white),
         ("FONTNAME",    (0,0), (-1,-1), FACE_B),
         ("FONTSIZE",    (0,0), (-1,-1), 11.5),
@@ -455,21 +558,42 @@ def _platform_banner(name: str) -> "Table":
         ("RIGHTPADDING",(0,0), (-1,-1), 6),
         ("TOPPADDING",  (0,0), (-1,-1), 4),
         ("BOTTOMPADDING",(0,0),(-1,-1), 3),
+    ])
+    _CTA_BASE = TableStyle([
+        ("BACKGROUND",  (0,0), (-1,-1), colors.HexColor("#F3F6FF")),
+        ("LEFTPADDING", (0,0), (-1,-1), 10),
+        ("RIGHTPADDING",(0,0), (-1,-1), 10),
+        ("TOPPADDING",  (0,0), (-1,-1), 8),
+        ("BOTTOMPADDING",(0,0), (-1,-1), 8),
+    ])
+else:
+    _BANNER_BASE = _CTA_BASE = None
+
+@functools.lru_cache(maxsize=32)
+def _banner_style(platform: str) -> "TableStyle":
+    """Full banner style (shared base + platform colour), built once per platform and reused across tables."""
+    col = _platform_color(platform)
+    return TableStyle([
+        ("BACKGROUND",  (0,0), (-1,-1), col),
         ("BOX",         (0,0), (-1,-1), 0.0, col),
-    ]))
+    ], parent=_BANNER_BASE)
+
+@functools.lru_cache(maxsize=32)
+def _cta_style(accent_hex: str) -> "TableStyle":
+    return TableStyle([
+        ("BOX",         (0,0), (-1,-1), 1.0, _color(accent_hex)),
+    ], parent=_CTA_BASE)
+
+def _platform_banner(name: str) -> "Table":
+    txt = f"  {name}  "
+    tbl = Table([[txt]], colWidths=["*"])
+    tbl.setStyle(_banner_style(name.lower()))
     return tbl
 
 def _cta_card(text: str, accent_hex: str) -> Table:
     p = _make_para(_auto_link(_sanitize_for_font(_safe_html(text))), CTA)
     box = Table([[p]], colWidths=["*"])
-    box.setStyle(TableStyle([
-        ("BACKGROUND",  (0,0), (-1,-1), colors.HexColor("#F3F6FF")),
-        ("BOX",         (0,0), (-1,-1), 1.0, colors.HexColor(accent_hex)),
-        ("LEFTPADDING", (0,0), (-1,-1), 10),
-        ("RIGHTPADDING",(0,0), (-1,-1), 10),
-        ("TOPPADDING",  (0,0), (-1,-1), 8),
-        ("BOTTOMPADDING",(0,0), (-1,-1), 8),
-    ]))
+    box.setStyle(_cta_style(accent_hex))
     return box
 
 def _qr_block(data: str, size: int = 90) -> Optional[Any]:
@@ -504,72 +628,119 @@ def _strip_p_wrappers(s: str) -> str:
     return s
 
 # Normalize to clean blocks for Paragraphs
-_PTAG_OPEN_RE  = re.compile(r'<\s*p[^>]*>', re.I)
-_PTAG_CLOSE_RE = re.compile(r'</\s*p\s*>', re.I)
-_BR_RE         = re.compile(r'<\s*br\s*/?\s*>', re.I)
+# <br>, </p> and <p ...> in one alternation; the matched group name picks the replacement.
+_BLOCK_TAG_RE = re.compile(r'(?P<br><\s*br\s*/?\s*>)|(?P<pclose></\s*p\s*>)|(?P<popen><\s*p[^>]*>)', re.I)
+_BLOCK_TAG_REPL = {"br": "\n", "pclose": "\n\n", "popen": ""}
+_BLOCK_SPLIT_RE = re.compile(r"\n{2,}")
 
 def _normalize_blocks(html: str) -> str:
-    """Flatten paragraph markup to plain blocks and collapse whitespace."""
+    """Flatten paragraph markup to plain blocks (`html` is already _safe_html-clean).
+    Runs of 3+ newlines are left for _BLOCK_SPLIT_RE, which treats any 2+ as one break."""
     if not html:
         return ""
-    s = _safe_html(html)
-    s = _BR_RE.sub("\n", s)
-    s = _PTAG_OPEN_RE.sub("", s)
-    s = _PTAG_CLOSE_RE.sub("\n\n", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
+    return _BLOCK_TAG_RE.sub(lambda m: _BLOCK_TAG_REPL[m.lastgroup], html)
+
+_IMG_SRC_RE = re.compile(r'src=(?:"|\')([^"\']+)(?:"|\')', re.I)
+_IMG_ALT_RE = re.compile(r'alt=(?:"|\')([^"\']*)(?:"|\')', re.I)
+
+_REMOTE_SRC_RX = re.compile(r"(?:https?://|data:)", re.I)
+
+def _img_pair(tag: str) -> Optional[Tuple[str, Optional[str]]]:
+    """(src, alt) for a local/relative <img> tag; None for remote/data URIs or a missing src."""
+    src_m = _IMG_SRC_RE.search(tag)
+    if src_m:
+        src = src_m.group(1)
+        if src and not _REMOTE_SRC_RX.match(src):
+            alt_m = _IMG_ALT_RE.search(tag)
+            return src, (alt_m.group(1) if alt_m else None)
+    return None
 
 def _extract_images(html: str) -> Tuple[str, List[Tuple[str, Optional[str]]]]:
     """Return (html_without_img_tags, [(path, alt)]). Only local/relative paths kept."""
     pairs: List[Tuple[str, Optional[str]]] = []
 
     def _repl(m):
-        tag = m.group(0)
-        src_m = re.search(r'src=(?:"|\')([^"\']+)(?:"|\')', tag, flags=re.I)
-        alt_m = re.search(r'alt=(?:"|\')([^"\']*)(?:"|\')', tag, flags=re.I)
-        if src_m:
-            src = src_m.group(1)
-            if src and not src.lower().startswith(("http://", "https://", "data:")):
-                alt = alt_m.group(1) if alt_m else None
-                pairs.append((src, alt))
+        pair = _img_pair(m.group(0))
+        if pair:
+            pairs.append(pair)
         return ""  # remove the <img ...> tag entirely
 
     html2 = _IMG_TAG_RE.sub(_repl, html or "")
     html2 = _IMG_CLOSE_RE.sub("", html2)
     return html2, pairs
 
-def _paragraphs_from_html(fragment: str) -> List[Any]:
+def _paragraph_texts(fragment: str) -> List[str]:
+    """Paragraph markup (sanitized + auto-linked) for each block of a prose fragment."""
     normalized = _normalize_blocks(fragment)  # handles <p>, </p>, <br>
-    chunks = [c.strip() for c in re.split(r"\n{2,}", normalized) if c.strip()]
-    return [_make_para(_auto_link(_sanitize_for_font(c)), BODY) for c in chunks]
+    chunks = [c.strip() for c in _BLOCK_SPLIT_RE.split(normalized) if c.strip()]
+    return [_auto_link(_sanitize_for_font(c)) for c in chunks]
+
+_OL_OPEN_RE = re.compile(r"\s*<ol", re.I)
+_LI_RE      = re.compile(r"<li[^>]*>(.*?)</li>", re.I | re.S)
 
-def _list_from_html(list_html: str) -> Optional[ListFlowable]:
-    is_ordered = bool(re.match(r"\s*<ol", list_html, flags=re.I))
-    items = re.findall(r"<li[^>]*>(.*?)</li>", list_html, flags=re.I | re.S)
+def _list_spec(list_html: str) -> Optional[Tuple[bool, Tuple[str, ...]]]:
+    """(is_ordered, sanitized item markup) for a <ul>/<ol> block; None when it has no <li>."""
+    items = _LI_RE.findall(list_html)
     if not items:
         return None
-    list_items = [ListItem(_make_para(_sanitize_for_font(_safe_html(i)), BODY), leftIndent=6) for i in items]
+    return bool(_OL_OPEN_RE.match(list_html)), tuple(_sanitize_for_font(_safe_html(i)) for i in items)
+
+def _list_flowable(is_ordered: bool, items: Tuple[str, ...]) -> ListFlowable:
+    list_items = [ListItem(_make_para(i, BODY), leftIndent=6) for i in items]
     return ListFlowable(list_items, bulletType=("1" if is_ordered else "bullet"), leftIndent=10)
 
-def _make_image_flowable(p: Path, max_img_w: float) -> Optional[RLImage]:
-    """Create a robust RLImage, fixing broken images with PIL; returns None on failure."""
+@functools.lru_cache(maxsize=32)
+def _normalized_png(path: str, mtime_ns: int, size: int) -> Optional[bytes]:
+    """PIL-normalized PNG bytes per (file, mtime, size), so repeat exports skip the decode/re-encode."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(path) as im:
+            im.load()
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGB")
+            buf = io.BytesIO()
+            im.save(buf, format="PNG")
+            return buf.getvalue()
+    except Exception:
+        return None
+
+def _jpeg_state(p: str) -> Optional[bool]:
+    """None if `p` isn't a JPEG (no SOI + marker header); else whether it ends in an EOI marker.
+    A truncated JPEG keeps a valid header, and ReportLab embeds it unchecked, so the tail matters."""
+    try:
+        with open(p, "rb") as fh:
+            if fh.read(3) != b"\xff\xd8\xff":
+                return None
+            fh.seek(max(0, os.fstat(fh.fileno()).st_size - 64))
+            return fh.read().rstrip(b"\x00").endswith(b"\xff\xd9")
+    except OSError:
+        return None
+
+def _make_image_flowable(p: str, st: os.stat_result, max_img_w: float) -> Optional[RLImage]:
+    """Create a robust RLImage, fixing broken images with PIL; returns None on failure.
+    `st` is the caller's os.stat() of `p` (proves it exists and keys the PNG cache)."""
     img = None
-    if Image is not None:
+    jpeg = _jpeg_state(p)
+    if jpeg:
+        # ReportLab embeds complete JPEGs as-is (DCTDecode): no PIL decode, no (larger) PNG re-encode.
+        try:
+            img = RLImage(p)
+            img.imageWidth  # RLImage is lazy; reading the header here catches a bad SOF before doc.build
+        except Exception:
+            img = None
+    png = None if img is not None else _normalized_png(os.path.abspath(p), st.st_mtime_ns, st.st_size)
+    if png is not None:
         try:
-            with Image.open(str(p)) as im:
-                im.load()
-                if im.mode not in ("RGB", "RGBA"):
-                    im = im.convert("RGB")
-                buf = io.BytesIO()
-                im.save(buf, format="PNG")
-                buf.seek(0)
-                img = RLImage(buf)
+            img = RLImage(io.BytesIO(png))
         except Exception:
             img = None
 
     if img is None:
+        if jpeg is False:
+            return None  # truncated JPEG PIL couldn't repair: embedded raw, it would render broken
         try:
-            img = RLImage(str(p))
+            img = RLImage(p)
         except Exception:
             return None
 
@@ -582,35 +753,72 @@ def _make_image_flowable(p: Path, max_img_w: float) -> Optional[RLImage]:
         pass
     return img
 
-def _html_to_flowables(html: str, max_img_w: float) -> List[Any]:
+# One scan over the body: <img> tags, stray </img> closers and <ul>/<ol> blocks.
+_HTML_TOKEN_RE = re.compile(
+    r"(?P<img><img\b[^>]*?>)|(?P<endimg></img\s*>)|(?P<list><ul[^>]*>.*?</ul>|<ol[^>]*>.*?</ol>)",
+    re.I | re.S,
+)
+
+@functools.lru_cache(maxsize=256)
+def _parse_html(html: str) -> Tuple[Tuple[Any, ...], Tuple[Tuple[str, Optional[str]], ...]]:
+    """
+    Parse body HTML into immutable block descriptors: ("p", markup) / ("list", is_ordered, items),
+    plus the (src, alt) image pairs. Cached by content; flowables hold layout state and are not
+    reusable across builds, so _html_to_flowables materializes fresh ones from these each time.
+    """
     html = _safe_html(html)
-    html, imgs = _extract_images(html)
 
-    flows: List[Any] = []
+    blocks: List[Any] = []
+    imgs: List[Tuple[str, Optional[str]]] = []
+    text: List[str] = []  # prose between lists; img tags are dropped from it
+
+    def _flush_text():
+        chunk = "".join(text)
+        text.clear()
+        if chunk.strip():
+            blocks.extend(("p", t) for t in _paragraph_texts(chunk))
+
     pos = 0
-    pattern = re.compile(r"(<ul[^>]*>.*?</ul>|<ol[^>]*>.*?</ol>)", re.I | re.S)
-    for m in pattern.finditer(html):
-        before = html[pos:m.start()]
-        if before.strip():
-            flows.extend(_paragraphs_from_html(before))
-        lst = _list_from_html(m.group(1))
-        if lst:
-            flows.append(lst)
+    for m in _HTML_TOKEN_RE.finditer(html):
+        text.append(html[pos:m.start()])
         pos = m.end()
-    tail = html[pos:]
-    if tail.strip():
-        flows.extend(_paragraphs_from_html(tail))
+        kind = m.lastgroup
+        if kind == "img":
+            pair = _img_pair(m.group("img"))
+            if pair:
+                imgs.append(pair)
+        elif kind == "list":
+            _flush_text()
+            list_html, inner = _extract_images(m.group("list"))
+            imgs.extend(inner)
+            spec = _list_spec(list_html)
+            if spec:
+                blocks.append(("list",) + spec)
+    text.append(html[pos:])
+    _flush_text()
+    return tuple(blocks), tuple(imgs)
+
+def _html_to_flowables(html: str, max_img_w: float) -> List[Any]:
+    blocks, imgs = _parse_html(html)
+    flows: List[Any] = [
+        _make_para(b[1], BODY) if b[0] == "p" else _list_flowable(b[1], b[2])
+        for b in blocks
+    ]
 
-    # images at the end (each as block)
+    # images at the end (each as block); a repeated src reuses the already-decoded flowable
+    decoded: Dict[str, Optional[RLImage]] = {}
     for pth, alt in imgs:
         try:
-            img_path = Path(pth)
-            if not img_path.exists():
-                msg = f'[missing image: {pth}]' if not alt else f'[missing image: {pth} — {alt}]'
-                flows.append(_make_para(_sanitize_for_font(f'<font color="#888888">{msg}</font>'), SMALL))
-                continue
-
-            img = _make_image_flowable(img_path, max_img_w)
+            if pth in decoded:
+                img = decoded[pth]
+            else:
+                try:
+                    st = os.stat(pth)
+                except OSError:
+                    msg = f'[missing image: {pth}]' if not alt else f'[missing image: {pth} — {alt}]'
+                    flows.append(_make_para(_sanitize_for_font(f'<font color="#888888">{msg}</font>'), SMALL))
+                    continue
+                img = decoded[pth] = _make_image_flowable(pth, st, max_img_w)
             if img is not None:
                 flows.append(Spacer(1, 6))
                 flows.append(img)
@@ -631,33 +839,32 @@ def _html_to_flowables(html: str, max_img_w: float) -> List[Any]:
 # -----------------------------------------------------------------------------
 # Main export (premium)
 # -----------------------------------------------------------------------------
-def export_pdf_response(payload: Dict[str, Any], out_dir: str = "generated_pdfs") -> str:
-    """Build a polished marketing PDF and return the absolute file path."""
-    out_dir = str(out_dir or "generated_pdfs")
-    out_path = Path(out_dir); out_path.mkdir(parents=True, exist_ok=True)
-    file_name = f"{uuid.uuid4().hex[:12]}.pdf"
-    final_path = (out_path / file_name).resolve()
+# Page geometry + static metadata shared by every premium document.
+_DOC_LAYOUT: Dict[str, Any] = dict(
+    pagesize=LETTER,
+    leftMargin=0.8*inch, rightMargin=0.8*inch, topMargin=0.9*inch, bottomMargin=0.9*inch,
+    author="Content365", subject="Marketing Content Pack", creator="Content365 PDF Engine",
+)
 
+def _build_premium(payload: Dict[str, Any], target: Any) -> None:
+    """Lay out and write the premium PDF to `target` (a filename or a binary file-like)."""
     title    = payload.get("title", "Content365 Pack")
     subtitle = payload.get("subtitle", "")
     blog_html= payload.get("blog_html", "")
     bullets  = payload.get("bullets", []) or []
     social   = payload.get("social", []) or []
     cta_text = payload.get("cta_text", "")
-    footer   = payload.get("footer", f"© {datetime.now().year} Content365 · content365.xyz")
+    # default built only when absent; an explicit "" still means "no footer"
+    footer   = payload["footer"] if "footer" in payload else f"© {datetime.now().year} Content365 · content365.xyz"
     brand    = payload.get("brand", {}) or {}
 
     watermark_text = payload.get("watermark") or ""  # optional
     debug_grid     = bool(payload.get("debug_grid"))
 
-    primary = colors.HexColor(_hex(brand.get("primary_color"), "#0B6BF2"))
+    primary = _color(_hex(brand.get("primary_color"), "#0B6BF2"))
     accent  = _hex(brand.get("accent_color"),  "#0B6BF2")
 
-    doc = SimpleDocTemplate(
-        str(final_path), pagesize=LETTER,
-        leftMargin=0.8*inch, rightMargin=0.8*inch, topMargin=0.9*inch, bottomMargin=0.9*inch,
-        title=_sanitize_for_font(title), author="Content365", subject="Marketing Content Pack", creator="Content365 PDF Engine",
-    )
+    doc = SimpleDocTemplate(target, title=_sanitize_for_font(title), **_DOC_LAYOUT)
 
     story: List[Any] = []
 
@@ -722,44 +929,76 @@ def export_pdf_response(payload: Dict[str, Any], out_dir: str = "generated_pdfs"
                 story.append(_make_para(_auto_link(_sanitize_for_font(_safe_html(caption))), BODY))
 
             if hashtags:
-                tag_line = " ".join(
-                    (h.strip() if h.strip().startswith("#") else f"#{h.strip()}")
-                    for h in hashtags
-                    if isinstance(h, str) and h.strip()
-                )
+                # strip each tag once, then prefix '#' where missing
+                stripped = (h.strip() for h in hashtags if isinstance(h, str))
+                tag_line = " ".join(t if t[0] == "#" else f"#{t}" for t in stripped if t)
                 if tag_line:
                     story.append(_make_para(_sanitize_for_font(tag_line), TAGS))
                     story.append(Spacer(1, 4))
 
             story.append(Spacer(1, 6))
 
-    # Page callbacks
+    # Page callbacks (header/footer text, links and widths are static for the document)
+    header = _prepare_header(brand, "Content365 · Marketing Pack")
+    footer_text, footer_url, footer_w = _prepare_footer(footer)
+
+    # Only the overlays this document enables, pre-bound once; _on_page just runs the list.
+    page_ops: List[Callable[[Canvas, Any], None]] = []
+    if debug_grid:
+        page_ops.append(_draw_debug_grid)
+    if watermark_text:
+        page_ops.append(functools.partial(_draw_watermark, text=watermark_text))
+    page_ops.append(functools.partial(_draw_header, brand=brand, header=header))
+    if footer_text:
+        page_ops.append(functools.partial(_draw_footer, footer_text=footer_text, footer_url=footer_url,
+                                          footer_w=footer_w, brand=brand))
+
     def _on_page(c: Canvas, d):
-        if debug_grid:
-            _draw_debug_grid(c, d)
-        _draw_watermark(c, d, watermark_text)
-        _draw_header(c, d, brand, "Content365 · Marketing Pack")
-        _draw_footer(c, d, footer, brand)
+        for op in page_ops:
+            op(c, d)
 
-    # Build & verify
-    try:
-        doc.build(story, onFirstPage=_on_page, onLaterPages=_on_page)
-    except Exception as e:
-        try:
-            if final_path.exists() and final_path.stat().st_size < 1024:
-                final_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-        raise RuntimeError(f"PDF build failed: {e!r}")
+    doc.build(story, onFirstPage=_on_page, onLaterPages=_on_page)
 
-    if not final_path.exists() or final_path.stat().st_size == 0:
-        raise RuntimeError("PDF generation produced no output file (post-build).")
+def export_pdf_response(payload: Dict[str, Any], out_dir: str = "generated_pdfs") -> str:
+    """Build a polished marketing PDF and return the absolute file path."""
+    out_dir = str(out_dir or "generated_pdfs")
+    out_path = Path(out_dir); out_path.mkdir(parents=True, exist_ok=True)
+    file_name = f"{uuid.uuid4().hex[:12]}.pdf"
+    final_path = (out_path / file_name).resolve()
+
+    # Build in memory first: a failed build never touches disk. The bytes then land in a
+    # sibling temp file with one write and are renamed into place, so readers never see a partial PDF.
+    data = export_pdf_bytes(payload)
+    tmp_path = final_path.with_suffix(".pdf.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, final_path)
+    except OSError as e:
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"PDF write failed: {e!r}")
 
     return str(final_path)
 
+def export_pdf_bytes(payload: Dict[str, Any]) -> bytes:
+    """Build the premium PDF in memory and return its bytes (no disk round-trip)."""
+    buf = io.BytesIO()
+    try:
+        _build_premium(payload, buf)
+    except Exception as e:
+        raise RuntimeError(f"PDF build failed: {e!r}")
+    return buf.getvalue()
+
 # -----------------------------------------------------------------------------
 # Tiny pure-Python fallback (no external deps)
 # -----------------------------------------------------------------------------
+class _PdfEscapeTable(dict):
+    """str.translate table: printable ASCII passes, string delimiters are escaped, the rest becomes '?'."""
+    def __missing__(self, cp: int) -> str:
+        return "?"
+
+_PDF_ESCAPE = _PdfEscapeTable({cp: (chr(cp) if 32 <= cp < 127 else "?") for cp in range(128)})
+_PDF_ESCAPE.update({ord("("): "\\(", ord(")"): "\\)", ord("\\"): "\\\\"})
+
 class _MiniPDF:
     PAGE_W = 612   # 8.5" * 72
     PAGE_H = 792   # 11"  * 72
@@ -769,101 +1008,146 @@ class _MiniPDF:
     MARGIN_B = 58
     LEADING = 14
     FONT_SIZE = 11
+    # Derived layout, fixed per class: the text baseline starts at TOP_Y and stops above TEXT_MIN_Y.
+    TOP_Y = PAGE_H - MARGIN_T
+    TEXT_MIN_Y = MARGIN_B + 3 * LEADING
+    LINES_PER_PAGE = (TOP_Y - TEXT_MIN_Y) // LEADING + 1
+    HEADER_Y = PAGE_H - 36
 
     def __init__(self):
-        self.objects: List[bytes] = []
+        self._text_state = b"/F1 %d Tf %d TL\n" % (self.FONT_SIZE, self.LEADING)
+        # Objects are serialized straight into one buffer; _offsets[n-1] is object n's xref offset.
+        self._buf = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._offsets: List[int] = []
         self.pages: List[int] = []
         self.font_obj = self._add_object(self._font_object("F1", "Helvetica"))
-
-    def _add_object(self, body: bytes) -> int:
-        self.objects.append(body)
-        return len(self.objects)
+        # Reserve the Pages tree id up front so each page dict names its /Parent as it is written.
+        self.pages_obj = self._reserve_object()
+
+    def _reserve_object(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets)
+
+    def _add_object(self, *parts: bytes, num: Optional[int] = None) -> int:
+        """Append object `num` (a fresh id if None) built from `parts`; returns its id."""
+        if num is None:
+            num = self._reserve_object()
+        self._offsets[num - 1] = len(self._buf)
+        buf = self._buf
+        buf += b"%d 0 obj\n" % num
+        for part in parts:
+            buf += part
+        buf += b"\nendobj\n"
+        return num
 
     @staticmethod
     def _pdf_str(s: str) -> str:
-        safe = ''.join((c if 32 <= ord(c) < 127 and c not in '()' else ('\\' + c if c in '()' else '?')) for c in (s or ""))
-        return safe
+        return (s or "").translate(_PDF_ESCAPE)
 
     @staticmethod
     def _font_object(name: str, base: str) -> bytes:
         return f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Name /{name} >>".encode()
 
-    def _begin_page(self, content_stream: bytes) -> int:
-        content_obj = self._add_object(b"<< /Length %d >>\nstream\n" % len(content_stream) + content_stream + b"\nendstream")
+    def _begin_page(self, *content: bytes) -> int:
+        """Write the page's content stream (given as pre-encoded parts) and its page dict."""
+        length = sum(map(len, content))
+        content_obj = self._add_object(b"<< /Length %d >>\nstream\n" % length, *content, b"\nendstream")
         page_dict = (
-            f"<< /Type /Page /Parent 0 0 R /MediaBox [0 0 {self.PAGE_W} {self.PAGE_H}] "
+            f"<< /Type /Page /Parent {self.pages_obj} 0 R /MediaBox [0 0 {self.PAGE_W} {self.PAGE_H}] "
             f"/Resources << /Font << /F1 {self.font_obj} 0 R >> >> /Contents {content_obj} 0 R >>"
         ).encode()
         page_obj = self._add_object(page_dict)
         self.pages.append(page_obj)
         return page_obj
 
-    def _header_footer_stream(self, page_num: int, page_count: int) -> str:
-        header = f"0.85 g 0 {self.PAGE_H-36} {self.PAGE_W} 24 re f 0 g\n"
+    def _header_footer_stream(self, page_num: int, page_count: int) -> bytes:
+        header = f"0.85 g 0 {self.HEADER_Y} {self.PAGE_W} 24 re f 0 g\n"
         footer = f"0.95 g 0 24 {self.PAGE_W} 18 re f 0 g\n"
         label = f"Page {page_num} of {page_count}"
         est_w = int(len(label) * (self.FONT_SIZE * 0.5))
         x = self.PAGE_W - self.MARGIN_R - est_w
         y = 30
-        text = f"BT /F1 {self.FONT_SIZE} Tf {x} {y} Td ({self._pdf_str(label)}) Tj ET\n"
-        return header + footer + text
+        text = f"BT {x} {y} Td ({self._pdf_str(label)}) Tj ET\n"
+        return (header + footer + text).encode("latin-1", errors="ignore")
 
-    def _text_block(self, line: str, x: int, y: int, leading: int) -> str:
-        l = self._pdf_str(line)
-        return f"BT /F1 {self.FONT_SIZE} Tf {x} {y} Td {leading} TL ({l}) Tj ET\n"
+    def _text_lines(self, lines: List[str], x: int, y: int) -> bytes:
+        """One BT/ET text object for a run of lines; T* steps down by the page's TL leading."""
+        if not lines:
+            return b""
+        body = " Tj T*\n".join(f"({self._pdf_str(l)})" for l in lines)
+        return f"BT {x} {y} Td\n{body} Tj\nET\n".encode("latin-1", errors="ignore")
 
     def add_page(self, lines: List[str], page_num: int, page_count: int):
-        buf: List[str] = [self._header_footer_stream(page_num, page_count)]
-        cursor_y = self.PAGE_H - self.MARGIN_T
-        x = self.MARGIN_L
-        for line in lines:
-            if cursor_y < self.MARGIN_B + 3 * self.LEADING:
-                break
-            buf.append(self._text_block(line, x, cursor_y, self.LEADING))
-            cursor_y -= self.LEADING
-        self._begin_page("".join(buf).encode("latin-1", errors="ignore"))
+        # Font/leading are text-state operators: set once per page, they persist across BT/ET.
+        # Parts go into the document buffer as-is: no joined page string, no second encode pass.
+        # Callers paginate in LINES_PER_PAGE chunks; the slice only guards against overflow.
+        self._begin_page(
+            self._text_state,
+            self._header_footer_stream(page_num, page_count),
+            self._text_lines(lines[:self.LINES_PER_PAGE], self.MARGIN_L, self.TOP_Y),
+        )
 
-    def save(self, path: str):
+    def getvalue(self) -> bytes:
+        """Finalize the document and return the complete PDF file contents (call once)."""
         kids = " ".join(f"{p} 0 R" for p in self.pages)
-        pages_obj = self._add_object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
-        fixed = [obj.replace(b"/Parent 0 0 R", f"/Parent {pages_obj} 0 R".encode()) for obj in self.objects]
-        self.objects = fixed
-        catalog_obj = self._add_object(f"<< /Type /Catalog /Pages {pages_obj} 0 R >>".encode())
+        self._add_object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode(), num=self.pages_obj)
+        catalog_obj = self._add_object(f"<< /Type /Catalog /Pages {self.pages_obj} 0 R >>".encode())
+        buf = self._buf
+        size = len(self._offsets) + 1
+        xref_pos = len(buf)
+        buf += b"xref\n0 %d\n0000000000 65535 f \n" % size
+        buf += b"".join(b"%010d 00000 n \n" % off for off in self._offsets)
+        buf += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF" % (size, catalog_obj, xref_pos)
+        return bytes(buf)
+
+    def save(self, path: str):
+        data = self.getvalue()
         with open(path, "wb") as f:
-            f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
-            offsets = [0]
-            for i, obj in enumerate(self.objects, start=1):
-                offsets.append(f.tell())
-                f.write(f"{i} 0 obj\n".encode()); f.write(obj); f.write(b"\nendobj\n")
-            xref_pos = f.tell()
-            f.write(f"xref\n0 {len(self.objects)+1}\n".encode())
-            f.write(b"0000000000 65535 f \n")
-            for off in offsets[1:]:
-                f.write(f"{off:010d} 00000 n \n".encode())
-            f.write(b"trailer\n"); f.write(f"<< /Size {len(self.objects)+1} /Root {catalog_obj} 0 R >>\n".encode())
-            f.write(b"startxref\n")
-            f.write(f"{xref_pos}\n".encode("ascii"))
-            f.write(b"%%EOF")
-
-def _generate_pdf_fallback(payload: Dict[str, Any], output_path: str, brand: Dict[str, Any]) -> str:
-    """Minimal dependency-free PDF if premium engine fails."""
+            f.write(data)
+
+def _wrap_line(ln: str, width: int) -> List[str]:
+    """
+    Greedy word wrap without breaking words (like textwrap.wrap with break_long_words and
+    break_on_hyphens off). Whitespace is normalized the same way on every line, short or long:
+    runs of inner whitespace collapse to one space and trailing whitespace is dropped. A leading
+    space indent is kept on the first line unless it cannot share that line with the first word.
+    """
+    words = ln.split()
+    if not words:
+        return [""]
+    indent = ln[:len(ln) - len(ln.lstrip(" "))]
+    if len(indent) + len(words[0]) > width:
+        indent = ""  # as textwrap does: an indent that cannot fit with the first word is dropped
+    out: List[str] = []
+    start = 0
+    running = len(indent) + len(words[0])
+    for i in range(1, len(words)):
+        tentative = running + 1 + len(words[i])
+        if tentative > width:
+            out.append(" ".join(words[start:i]))
+            start, running = i, len(words[i])
+        else:
+            running = tentative
+    out.append(" ".join(words[start:]))
+    if indent:
+        out[0] = indent + out[0]
+    return out
+
+def _generate_pdf_fallback(payload: Dict[str, Any], output_path: Optional[str], brand: Dict[str, Any]) -> Union[str, bytes]:
+    """Minimal dependency-free PDF if premium engine fails (bytes when `output_path` is None)."""
     lines: List[str] = []
-    title = payload.get("title") or (payload.get("blog", {}) or {}).get("headline") or "Content365 Pack"
+    blog = payload.get("blog") or {}
+    title = payload.get("title") or blog.get("headline") or "Content365 Pack"
     lines += [_sanitize_for_font(title.upper()), ""]
-    intro = (payload.get("blog", {}) or {}).get("intro") or ""
-    if intro: lines += [_sanitize_for_font(intro), ""]
-    for p in (payload.get("blog", {}) or {}).get("body") or []:
-        lines += [_sanitize_for_font(str(p)), ""]
-    for b in payload.get("bullets", []) or (payload.get("blog", {}) or {}).get("bullets") or []:
+    # intro + body paragraphs share one layout: text, then a blank line
+    for p in itertools.chain((blog.get("intro"),), blog.get("body") or ()):
+        if p: lines += [_sanitize_for_font(str(p)), ""]
+    for b in payload.get("bullets", []) or blog.get("bullets") or []:
         lines.append(_sanitize_for_font(f"- {b}"))
-    cta = payload.get("cta_text") or (payload.get("blog", {}) or {}).get("cta") or ""
+    cta = payload.get("cta_text") or blog.get("cta") or ""
     if cta: lines += ["", _sanitize_for_font(cta)]
     # social
-    social = payload.get("social") or []
-    platforms = payload.get("platforms") or {}
-    if not social and platforms:
-        for name, data in platforms.items():
-            social.append({"name": name, "caption": data.get("caption",""), "hashtags": data.get("hashtags",[])})
+    social = payload.get("social") or list(_iter_social(None, None, payload.get("platforms")))
     if social:
         lines += ["", "SOCIAL CAPTIONS:"]
         for s in social:
@@ -875,66 +1159,75 @@ def _generate_pdf_fallback(payload: Dict[str, Any], output_path: str, brand: Dic
     max_chars = 90
     wrapped: List[str] = []
     for ln in lines:
-        words = ln.split()
-        if not words:
+        if not ln or ln.isspace():  # no stripped copy just to test for blank
             wrapped.append("")
             continue
-        cur: List[str] = []
-        cur_len = 0
-        for w in words:
-            add = (1 if cur else 0) + len(w)
-            if cur_len + add <= max_chars:
-                cur.append(w); cur_len += add
-            else:
-                wrapped.append(" ".join(cur)); cur=[w]; cur_len=len(w)
-        if cur: wrapped.append(" ".join(cur))
-    line_budget = int((pdf.PAGE_H - pdf.MARGIN_T - pdf.MARGIN_B) / pdf.LEADING)
-    pages = [wrapped[i:i+line_budget] for i in range(0, len(wrapped), line_budget)]
-    for i, pg in enumerate(pages, start=1):
-        pdf.add_page(pg, i, len(pages))
+        wrapped.extend(_wrap_line(ln, max_chars))
+    line_budget = pdf.LINES_PER_PAGE  # same budget add_page draws, so no line is dropped at a page break
+    # One page slice at a time; the page count (for "Page i of n") is just arithmetic.
+    total_pages = -(-len(wrapped) // line_budget)
+    for i, start in enumerate(range(0, len(wrapped), line_budget), start=1):
+        pdf.add_page(wrapped[start:start + line_budget], i, total_pages)
+    if output_path is None:
+        return pdf.getvalue()
     pdf.save(output_path)
     return output_path
 
 # -----------------------------------------------------------------------------
 # Compatibility: accept legacy/new payloads and normalize to premium shape
 # -----------------------------------------------------------------------------
+def _str_or(v: Any, default: str) -> str:
+    """Stripped string form of `v`, or `default` when that is empty."""
+    if not v:
+        return default
+    return (v if isinstance(v, str) else str(v)).strip() or default
+
+_P = "<p>{0}</p>".format  # bound C method: one call per paragraph, no f-string bytecode
+
+def _first_truthy(*vals: Any) -> Any:
+    """First truthy value, else None (each candidate is fetched exactly once by the caller)."""
+    for v in vals:
+        if v:
+            return v
+    return None
+
+def _iter_social(captions: Optional[Dict[str, Any]], hashtags: Optional[Dict[str, Any]],
+                 platforms: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield {name, caption, hashtags} per platform from legacy `captions`/`hashtags` or `platforms`."""
+    if captions:
+        hashtags = hashtags or {}
+        for plat, cap in captions.items():
+            text = cap.get("text") if isinstance(cap, dict) else str(cap or "")
+            yield {"name": plat, "caption": text, "hashtags": hashtags.get(plat) or []}
+    elif platforms:
+        for plat, data in platforms.items():
+            data = data or {}
+            yield {"name": plat, "caption": data.get("caption") or "", "hashtags": data.get("hashtags") or []}
+
 def _adapt_payload_legacy(payload: Dict[str, Any], brand_cfg: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Accepts both new shape and legacy:
       - New: {title, subtitle, blog_html, bullets, social[{name,caption,hashtags}], ...}
       - Legacy A: {blog:{headline,intro,body[],bullets[],cta}, captions:{plat:text|{text}}, hashtags:{plat:[...]}}
       - Legacy B: {blog:{title,intro,bullets,cta}, platforms:{plat:{caption,hashtags}}}
-    Produces the new shape for export_pdf_response.
+    Produces the new shape for export_pdf_response, tagged `_normalized`. A tagged payload with
+    no new brand config is returned as-is (no copy), so treat the result as read-only.
     """
+    if payload.get("_normalized") and not brand_cfg:
+        return payload
+    pget = payload.get
     if "blog_html" in payload or "social" in payload:
         newp = dict(payload)
     else:
-        blog = payload.get("blog") or {}
-        title = blog.get("headline") or blog.get("title") or payload.get("title") or "Content365 Pack"
-        subtitle = payload.get("subtitle") or ""
-        parts: List[str] = []
-        if blog.get("intro"):
-            parts.append(f"<p>{blog['intro']}</p>")
-        for p in (blog.get("body") or []):
-            parts.append(f"<p>{p}</p>")
-        blog_html = payload.get("blog_html") or "\n".join(parts)
-        bullets = blog.get("bullets") or payload.get("bullets") or []
-        cta = blog.get("cta") or payload.get("cta_text") or ""
-
-        social: List[Dict[str, Any]] = []
-        captions = payload.get("captions") or {}
-        hashtags = payload.get("hashtags") or {}
-        platforms = payload.get("platforms") or {}
-
-        if captions:
-            for plat, cap in captions.items():
-                text = cap.get("text") if isinstance(cap, dict) else str(cap or "")
-                hts = hashtags.get(plat) or []
-                social.append({"name": plat, "caption": text, "hashtags": hts})
-        elif platforms:
-            for plat, data in platforms.items():
-                data = data or {}
-                social.append({"name": plat, "caption": data.get("caption") or "", "hashtags": data.get("hashtags") or []})
+        blog = pget("blog") or {}
+        bget = blog.get
+        title = _first_truthy(bget("headline"), bget("title"), pget("title")) or "Content365 Pack"
+        subtitle = pget("subtitle") or ""
+        blog_html = "\n".join(map(_P, filter(None, itertools.chain((bget("intro"),), bget("body") or ()))))
+        bullets = _first_truthy(bget("bullets"), pget("bullets")) or []
+        cta = _first_truthy(bget("cta"), pget("cta_text")) or ""
+
+        social = list(_iter_social(pget("captions"), pget("hashtags"), pget("platforms")))
 
         newp = {
             "title": title,
@@ -946,10 +1239,10 @@ def _adapt_payload_legacy(payload: Dict[str, Any], brand_cfg: Optional[Dict[str,
         }
 
     # --- brand normalization (defensive + defaults) ---
-    _cfg = (brand_cfg or payload.get("brand") or {}) or {}
+    _cfg = (brand_cfg or pget("brand") or {}) or {}
 
-    brand_name = str(_cfg.get("brand_name") or "Content365").strip() or "Content365"
-    website    = str(_cfg.get("website")    or "content365.xyz").strip() or "content365.xyz"
+    brand_name = _str_or(_cfg.get("brand_name"), "Content365")
+    website    = _str_or(_cfg.get("website"),    "content365.xyz")
 
     logo_path  = _cfg.get("logo_path") or None
     try:
@@ -957,8 +1250,8 @@ def _adapt_payload_legacy(payload: Dict[str, Any], brand_cfg: Optional[Dict[str,
     except Exception:
         logo_max_h = 22
 
-    primary    = str(_cfg.get("primary_color") or "#0B6BF2").strip() or "#0B6BF2"
-    accent     = str(_cfg.get("accent_color")  or "#0B6BF2").strip() or "#0B6BF2"
+    primary    = _str_or(_cfg.get("primary_color"), "#0B6BF2")
+    accent     = _str_or(_cfg.get("accent_color"),  "#0B6BF2")
 
     newp["brand"] = {
         "brand_name":    brand_name,
@@ -972,19 +1265,21 @@ def _adapt_payload_legacy(payload: Dict[str, Any], brand_cfg: Optional[Dict[str,
     }
 
     if "footer" not in newp:
-        newp["footer"] = payload.get("footer") or f"© {datetime.now().year} {newp['brand']['brand_name']} · {newp['brand']['website']}"
+        newp["footer"] = pget("footer") or f"© {datetime.now().year} {newp['brand']['brand_name']} · {newp['brand']['website']}"
 
+    newp["_normalized"] = True
     return newp
 
 # -----------------------------------------------------------------------------
 # Compatibility wrapper for main.py + graceful fallback
 # -----------------------------------------------------------------------------
-def generate_pdf(payload: Dict[str, Any], output_path: str, brand_config: Optional[Dict[str, Any]] = None) -> str:
+def generate_pdf(payload: Dict[str, Any], output_path: Optional[str] = None,
+                 brand_config: Optional[Dict[str, Any]] = None) -> Union[str, bytes]:
     """
     Entry point expected by main.py.
     - Adapts legacy payloads to the premium shape.
     - Uses premium ReportLab engine when available; otherwise uses the tiny pure-Python fallback.
-    - Writes exactly to `output_path`.
+    - Writes exactly to `output_path` and returns it; with no `output_path`, returns the PDF bytes.
     """
     _g = globals()
     adapt    = _g.get("_adapt_payload_legacy")
@@ -997,12 +1292,21 @@ def generate_pdf(payload: Dict[str, Any], output_path: str, brand_config: Option
             f"adapt={bool(callable(adapt))}, fallback={bool(callable(fallback))}"
         )
 
-    output_path = str(output_path)
-    out_dir = str(Path(output_path).parent or "generated_pdfs")
-
     # Normalize payload to the premium/new shape (works for legacy too)
     premium_payload = adapt(payload or {}, brand_config or {})
 
+    if output_path is None:
+        # In-memory mode: nothing touches the disk.
+        if globals().get("_HAS_REPORTLAB", False):
+            try:
+                return export_pdf_bytes(premium_payload)
+            except Exception:
+                pass
+        return fallback(payload or {}, None, premium_payload.get("brand", {}))
+
+    output_path = str(output_path)
+    out_dir = str(Path(output_path).parent or "generated_pdfs")
+
     # If ReportLab isn't actually available, skip premium entirely.
     if not globals().get("_HAS_REPORTLAB", False):
         return fallback(payload or {}, output_path, premium_payload.get("brand", {}))
@@ -1022,7 +1326,7 @@ def generate_pdf(payload: Dict[str, Any], output_path: str, brand_config: Option
         # Any premium failure gracefully falls back to the minimal writer.
         return fallback(payload or {}, output_path, premium_payload.get("brand", {}))
 
-__all__ = ["export_pdf_response", "generate_pdf"]
+__all__ = ["export_pdf_response", "export_pdf_bytes", "generate_pdf"]
 
 if __name__ == "__main__":  # lightweight self-test harness
     import sys, json, argparse, subprocess
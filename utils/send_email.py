@@ -1,51 +1,225 @@
 # utils/send_email.py
+import asyncio
+import binascii
+import functools
+import json
 import os
-from typing import Optional
+import random
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-def send_pdf_email(to_email: str, pdf_path: str, subject: str, body_text: Optional[str] = None) -> bool:
-    """
-    Sends the generated PDF as an attachment via SendGrid.
-    Returns True on success, False on failure or if config missing.
-    """
-    api_key = os.getenv("SENDGRID_API_KEY", "").strip()
-    from_email = os.getenv("FROM_EMAIL", "").strip()
-    from_name = os.getenv("FROM_NAME", "Content365").strip()
+try:
+    import httpx
+except Exception:  # pragma: no cover
+    httpx = None
+try:
+    import pybase64  # SIMD (AVX2/NEON) base64 when installed; picks the best ISA at import
+except Exception:  # pragma: no cover
+    pybase64 = None
+try:
+    import orjson  # serializes the multi-MB base64 attachment much faster than stdlib json
+except Exception:  # pragma: no cover
+    orjson = None
 
-    if not (api_key and from_email and to_email and pdf_path and os.path.exists(pdf_path)):
-        return False
+_SENDGRID_BASE_URL = "https://api.sendgrid.com"
 
-    try:
-        import base64
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail, Email, To, Attachment, FileContent, FileName, FileType, Disposition
-
-        with open(pdf_path, "rb") as f:
-            data = f.read()
-        encoded = base64.b64encode(data).decode()
-
-        attachment = Attachment(
-            FileContent(encoded),
-            FileName(os.path.basename(pdf_path)),
-            FileType("application/pdf"),
-            Disposition("attachment"),
-        )
+@functools.lru_cache(maxsize=1)
+def _sendgrid_config() -> Tuple[str, str, str]:
+    """(api_key, from_email, from_name), read on first use so a later load_dotenv() is still seen."""
+    return (
+        os.getenv("SENDGRID_API_KEY", "").strip(),
+        os.getenv("FROM_EMAIL", "").strip(),
+        os.getenv("FROM_NAME", "Content365").strip(),
+    )
 
-        subject_line = subject or "Your Content365 Marketing Pack"
-        body = body_text or (
-            "Thanks for using Content365!\n\n"
-            "Your marketing content pack PDF is attached.\n\n"
-            "— The Content365 Team"
-        )
-        message = Mail(
-            from_email=Email(from_email, from_name),
-            to_emails=To(to_email),
-            subject=subject_line,
-            plain_text_content=body
+def refresh_env() -> None:
+    """Drop the cached SendGrid settings (tests / config reloads)."""
+    _sendgrid_config.cache_clear()
+
+# Multiple of 3, so each chunk encodes without '=' padding except the last.
+_B64_CHUNK = 57 * 1024
+
+if pybase64 is not None:
+    _b64encode = pybase64.b64encode
+else:
+    def _b64encode(data: Any) -> bytes:
+        return binascii.b2a_base64(data, newline=False)
+
+def _b64_len(size: int) -> int:
+    return ((size + 2) // 3) * 4
+
+def _b64_file(path: str, size: int) -> str:
+    """Base64 of a file, encoded chunk by chunk so the raw bytes are never all held at once."""
+    out = bytearray(_b64_len(size))  # preallocated from the stat'd size; grows/trims if the file changed
+    pos = 0
+    buf = bytearray(_B64_CHUNK)
+    view = memoryview(buf)
+    enc_chunk = _b64encode
+    with open(path, "rb") as f:
+        readinto = f.readinto  # buffered: fills `buf` completely until EOF
+        n = readinto(buf)
+        while n:
+            enc = enc_chunk(view[:n])
+            out[pos:pos + len(enc)] = enc
+            pos += len(enc)
+            n = readinto(buf)
+    if pos != len(out):
+        del out[pos:]
+    return out.decode("ascii")
+
+@functools.lru_cache(maxsize=8)
+def _encoded_pdf(path: str, mtime_ns: int, size: int) -> str:
+    """Encoded attachment per (file, mtime, size); repeat sends of one pack skip the read + encode."""
+    return _b64_file(path, size)
+
+# Shared keep-alive pool; created lazily so it binds to the server's running loop.
+_client: Optional["httpx.AsyncClient"] = None
+
+def _get_client() -> "httpx.AsyncClient":
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=_SENDGRID_BASE_URL,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=10.0),
         )
-        message.attachment = attachment
+    return _client
+
+# Background sends queued by schedule_pdf_email (strong refs so tasks aren't GC'd mid-flight).
+_pending: Set["asyncio.Task"] = set()
+_SEND_RETRIES = 5
+
+async def aclose() -> None:
+    """Let queued sends finish (briefly), then close the shared SendGrid client (called on app shutdown)."""
+    global _client
+    if _pending:
+        _done, not_done = await asyncio.wait(set(_pending), timeout=10)
+        for t in not_done:
+            t.cancel()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+_DEFAULT_SUBJECT = "Your Content365 Marketing Pack"
+_DEFAULT_BODY = (
+    "Thanks for using Content365!\n\n"
+    "Your marketing content pack PDF is attached.\n\n"
+    "— The Content365 Team"
+)
+
+# SendGrid v3 accepts at most 1000 personalizations per mail/send request.
+_MAX_PERSONALIZATIONS = 1000
+
+def _dumps(obj: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+# SendGrid rejects messages over 30 MB; the attachment is sent base64-encoded.
+_MAX_MESSAGE_BYTES = 30 * 1024 * 1024
 
-        sg = SendGridAPIClient(api_key)
-        resp = sg.send(message)
-        return resp.status_code < 300
+def _preflight(to_emails: List[str], pdf_path: str) -> Optional[os.stat_result]:
+    """The PDF's stat if a send can be attempted (config, recipients, file present and under the size cap)."""
+    api_key, from_email, _ = _sendgrid_config()
+    if httpx is None or not (api_key and from_email and to_emails and pdf_path):
+        return None
+    try:
+        st = os.stat(pdf_path)
+    except OSError:
+        return None
+    return st if _b64_len(st.st_size) <= _MAX_MESSAGE_BYTES else None
+
+# Outcomes of one delivery attempt. Only _RETRY is worth repeating: a rate limit, a
+# SendGrid 5xx, or a request that never reached SendGrid. 4xx errors are permanent, and
+# a read timeout may mean the mail was accepted, so retrying could send a duplicate.
+_SENT, _RETRY, _FAILED = "sent", "retry", "failed"
+
+def _classify(status_code: int) -> str:
+    if status_code < 300:
+        return _SENT
+    if status_code == 429 or status_code >= 500:
+        return _RETRY
+    return _FAILED
+
+async def _deliver(to_emails: List[str], pdf_path: str, subject: str, body_text: Optional[str]) -> str:
+    """One mail/send call per 1000 recipients, each recipient in its own personalization."""
+    st = _preflight(to_emails, pdf_path)
+    if st is None:
+        return _FAILED
+    api_key, from_email, from_name = _sendgrid_config()
+
+    try:
+        # Disk read + encode run in a worker thread so concurrent sends keep the loop free.
+        encoded = await asyncio.to_thread(_encoded_pdf, os.path.abspath(pdf_path), st.st_mtime_ns, st.st_size)
+
+        subject_line = subject or _DEFAULT_SUBJECT
+        body = body_text or _DEFAULT_BODY
+        message: Dict[str, Any] = {
+            "from": {"email": from_email, "name": from_name},
+            "subject": subject_line,
+            "content": [{"type": "text/plain", "value": body}],
+            "attachments": [{
+                "content": encoded,
+                "filename": os.path.basename(pdf_path),
+                "type": "application/pdf",
+                "disposition": "attachment",
+            }],
+        }
+        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        client = _get_client()
+
+        outcome = _SENT
+        for i in range(0, len(to_emails), _MAX_PERSONALIZATIONS):
+            batch = to_emails[i:i + _MAX_PERSONALIZATIONS]
+            message["personalizations"] = [{"to": [{"email": e}]} for e in batch]
+            resp = await client.post("/v3/mail/send", content=_dumps(message), headers=headers)
+            result = _classify(resp.status_code)
+            if result == _FAILED or outcome == _SENT:
+                outcome = result
+        return outcome
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+        return _RETRY  # the request never left this process
     except Exception:
+        return _FAILED
+
+async def _send_pdf(to_emails: List[str], pdf_path: str, subject: str, body_text: Optional[str]) -> bool:
+    return await _deliver(to_emails, pdf_path, subject, body_text) == _SENT
+
+async def send_pdf_email(to_email: str, pdf_path: str, subject: str, body_text: Optional[str] = None) -> bool:
+    """
+    Sends the generated PDF as an attachment via the SendGrid v3 REST API.
+    Returns True on success, False on failure or if config missing.
+    """
+    return await _send_pdf([to_email] if to_email else [], pdf_path, subject, body_text)
+
+async def send_pdf_email_bulk(to_emails: List[str], pdf_path: str, subject: str,
+                              body_text: Optional[str] = None) -> bool:
+    """
+    Sends one PDF to many recipients, sharing the attachment across up to 1000
+    personalizations per request (each recipient gets their own copy).
+    Returns True only if every batch was accepted.
+    """
+    recipients = list(dict.fromkeys(e.strip() for e in (to_emails or []) if e and e.strip()))
+    return await _send_pdf(recipients, pdf_path, subject, body_text)
+
+async def _send_with_retry(to_email: str, pdf_path: str, subject: str, body_text: Optional[str]) -> bool:
+    for attempt in range(_SEND_RETRIES):
+        outcome = await _deliver([to_email], pdf_path, subject, body_text)
+        if outcome != _RETRY:
+            return outcome == _SENT
+        if attempt < _SEND_RETRIES - 1:
+            await asyncio.sleep(min(60.0, 2.0 * (2 ** attempt)) * random.uniform(0.5, 1.0))
+    return False
+
+def schedule_pdf_email(to_email: str, pdf_path: str, subject: str, body_text: Optional[str] = None) -> bool:
+    """
+    Queues send_pdf_email on the running loop and returns immediately; transient failures
+    (429, 5xx, connection errors) are retried with jittered backoff, permanent ones are not.
+    Returns False (nothing queued) if config is missing.
+    """
+    recipients = [to_email] if to_email else []
+    if _preflight(recipients, pdf_path) is None:
         return False
+    task = asyncio.get_running_loop().create_task(_send_with_retry(to_email, pdf_path, subject, body_text))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return True